@@ -16,9 +16,11 @@ All errors are wrapped as StegoEngineError with descriptive messages.
 """
 
 from pathlib import Path
+from collections import OrderedDict
 from typing import Optional, Tuple
 
 import hashlib
+import threading
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 
@@ -28,6 +30,20 @@ from cryptography.hazmat.primitives.asymmetric import rsa, padding
 RSAPrivateKey = rsa.RSAPrivateKey
 RSAPublicKey = rsa.RSAPublicKey
 
+# OAEP(SHA-256) padding is immutable, so build it once and reuse for every wrap/unwrap.
+_OAEP = padding.OAEP(
+    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None,
+)
+
+# Fingerprint cache keyed by id(public_key). Key objects are neither hashable nor
+# weak-referenceable, so each entry holds the key itself; that keeps the id from
+# being reused while the entry lives. Bounded LRU.
+_FINGERPRINT_CACHE_SIZE = 256
+_fingerprint_cache: "OrderedDict[int, Tuple[RSAPublicKey, bytes]]" = OrderedDict()
+_fingerprint_lock = threading.Lock()
+
 
 def generate_rsa_keypair(key_size: int = 3072) -> Tuple[RSAPrivateKey, RSAPublicKey]:
     """
@@ -185,11 +201,7 @@ def rsa_encrypt_key(public_key: RSAPublicKey, key_bytes: bytes) -> bytes:
     try:
         ek = public_key.encrypt(
             key_bytes,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None,
-            ),
+            _OAEP,
         )
     except ValueError as exc:
         raise StegoEngineError(f"RSA encryption failed: {exc}") from exc
@@ -211,11 +223,7 @@ def rsa_decrypt_key(private_key: RSAPrivateKey, ek_bytes: bytes) -> bytes:
     try:
         key_bytes = private_key.decrypt(
             ek_bytes,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None,
-            ),
+            _OAEP,
         )
     except ValueError as exc:
         raise StegoEngineError(
@@ -224,22 +232,51 @@ def rsa_decrypt_key(private_key: RSAPrivateKey, ek_bytes: bytes) -> bytes:
     return key_bytes
 
 
-def fingerprint_public_key(public_key: RSAPublicKey) -> str:
+def fingerprint_public_key_bytes(public_key: RSAPublicKey) -> bytes:
     """
-    Compute a short fingerprint for the public key.
+    Compute the raw 16-byte fingerprint for the public key.
 
     Implementation: SHA-256 over DER encoding (SubjectPublicKeyInfo),
-    returning the first 16 bytes as a 32-character hex string.
+    truncated to the first 16 bytes.
+
+    Results are cached per key object, so repeated fingerprinting of the
+    same key skips DER serialization and hashing.
 
     :param public_key: RSA public key.
-    :return: Hex fingerprint string (32 characters).
+    :return: Fingerprint bytes (16 bytes).
     """
+    key_id = id(public_key)
+    with _fingerprint_lock:
+        entry = _fingerprint_cache.get(key_id)
+        if entry is not None and entry[0] is public_key:
+            _fingerprint_cache.move_to_end(key_id)
+            return entry[1]
+
     der = public_key.public_bytes(
         encoding=serialization.Encoding.DER,
         format=serialization.PublicFormat.SubjectPublicKeyInfo,
     )
-    digest = hashlib.sha256(der).hexdigest()
-    return digest[:32]
+    fingerprint = hashlib.sha256(der).digest()[:16]
+
+    with _fingerprint_lock:
+        _fingerprint_cache[key_id] = (public_key, fingerprint)
+        _fingerprint_cache.move_to_end(key_id)
+        if len(_fingerprint_cache) > _FINGERPRINT_CACHE_SIZE:
+            _fingerprint_cache.popitem(last=False)
+    return fingerprint
+
+
+def fingerprint_public_key(public_key: RSAPublicKey) -> str:
+    """
+    Compute a short fingerprint for the public key.
+
+    Implementation: SHA-256 over DER encoding (SubjectPublicKeyInfo),
+    returning the first 16 bytes as a 32-character hex string.
+
+    :param public_key: RSA public key.
+    :return: Hex fingerprint string (32 characters).
+    """
+    return fingerprint_public_key_bytes(public_key).hex()
 
 
 __all__ = [
@@ -253,4 +290,5 @@ __all__ = [
     "rsa_encrypt_key",
     "rsa_decrypt_key",
     "fingerprint_public_key",
+    "fingerprint_public_key_bytes",
 ]
@@ -1,11 +1,10 @@
 from __future__ import annotations
+import hashlib
 import os
 from typing import Optional, Tuple, Final
 
 from argon2.low_level import hash_secret_raw, Type
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
 
 # ------------------------------------------------------------
 # Argon2id – reasonable secure defaults (ตามแนว RFC 9106)
@@ -47,7 +46,8 @@ def derive_key_argon2id(
     :param salt: ค่า salt แบบสุ่ม (os.urandom) ความยาว >= 16 bytes
     :param time_cost: จำนวนรอบการทำงาน (ยิ่งมากยิ่งช้า แต่ปลอดภัยขึ้น)
     :param memory_cost: หน่วยเป็น KiB, 64_000 = ~64 MiB
-    :param parallelism: จำนวน thread/CPU lanes ที่ใช้
+    :param parallelism: จำนวน thread/CPU lanes ที่ใช้ (เป็นส่วนหนึ่งของ key
+                        ต้องใช้ค่าเดียวกันตอน derive ซ้ำ)
     :param length: ความยาว key ที่ต้องการ (bytes)
     :return: key สำหรับใช้กับ AES-GCM หรือ crypto อื่น ๆ (bytes)
     """
@@ -77,13 +77,14 @@ def derive_key_pbkdf2(
     """
     PBKDF2-HMAC-SHA256 KDF.
     """
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=length,
-        salt=salt,
-        iterations=iterations,
+    return hashlib.pbkdf2_hmac(
+        "sha256",
+        password.encode("utf-8"),
+        salt,
+        iterations,
+        dklen=length,
     )
-    return kdf.derive(password.encode("utf-8"))
+
 
 def aes_gcm_encrypt(
     key: bytes,
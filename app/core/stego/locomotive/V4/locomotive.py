@@ -1,13 +1,57 @@
 import os
 import math
-import struct
+import mmap
+import array
 import random
-from PyQt6.QtWidgets import QFileDialog, QMessageBox
+import secrets
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
+
+# --- Header / Carrier Copy (ใช้ร่วมกับ Locomotive หลัก) ---
+from app.core.stego.locomotive.carrier_io import (
+    FRAG_HDR,
+    SESSION_HDR,
+    CHUNK_HDR,
+    PNG_FILE_SIG,
+    COPY_BUFSIZE,
+    copy_carrier
+)
+
+
+class JobSignals(QObject):
+    # QRunnable ไม่ใช่ QObject จึงต้องแยก Signal ไว้ใน Object นี้
+    progress = pyqtSignal(int, int)   # (ทำไปแล้ว, ทั้งหมด)
+    finished = pyqtSignal(object)     # ผลลัพธ์ที่ fn คืนมา
+
+
+class StegoJob(QRunnable):
+    """
+    Job สำหรับ QThreadPool: เรียก fn(progress) นอก GUI Thread แล้วส่งผลลัพธ์กลับผ่าน Signal
+    """
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.signals = JobSignals()
+        # Python ถือ Reference เอง (ผ่าน StegoLogic._active_jobs) ไม่ให้ Qt ลบทิ้งก่อน
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            result = self.fn(self.signals.progress.emit)
+        except Exception as e:
+            result = ("critical", "Error", str(e))
+        self.signals.finished.emit(result)
+
 
 class StegoLogic:
     
     PNG_EOF_SIG = b'\x00\x00\x00\x00IEND\xaeB`\x82'
     FRAG_SIG = b'FRAG' 
+    BLOCK_SIZE = 4096       # ขนาดข้อมูลต่อ Fragment
+    COPY_BUFSIZE = COPY_BUFSIZE  # 1 MiB ต่อรอบเวลา copy/อ่านไฟล์แบบ Stream
+    MAX_EMBED_WORKERS = 8   # จำนวน Thread สูงสุดตอนฝัง Shard หลายรูปพร้อมกัน
     
     @staticmethod
     def select_file(app, line_edit, type_):
@@ -24,48 +68,67 @@ class StegoLogic:
         หั่นข้อมูล -> แปะเบอร์ลำดับ -> สับตำแหน่ง (Shuffle)
         Structure: [SIG(4)][Index(4)][Len(4)] + [Data]
         """
-        BLOCK_SIZE = 4096 
+        BLOCK_SIZE = StegoLogic.BLOCK_SIZE
         total_len = len(data)
         chunks_count = math.ceil(total_len / BLOCK_SIZE)
         
-        # 1. สร้าง List เก็บชิ้นส่วน
-        chunk_list = []
+        # 1. ตัดชิ้นด้วย memoryview (ไม่ copy ข้อมูล จะ copy จริงครั้งเดียวตอนเขียนลง stream)
+        mv = memoryview(data)
         
-        for i in range(chunks_count):
-            start = i * BLOCK_SIZE
-            end = start + BLOCK_SIZE
-            chunk_data = data[start:end]
-            
-            # เก็บข้อมูลคู่กับลำดับ (i) ไว้ก่อน
-            chunk_list.append({
-                'index': i,
-                'data': chunk_data
-            })
-            
         # 2. *** สับตำแหน่ง (Shuffle) ***
-        random.shuffle(chunk_list)
+        order = StegoLogic._shuffled_order(chunks_count)
         
         # 3. สร้าง Stream จากข้อมูลที่สลับที่แล้ว
-        final_stream = b''
+        # จองบัฟเฟอร์ขนาดพอดีครั้งเดียว (ข้อมูล + Header 12 bytes ต่อชิ้น)
+        # แทนการต่อ bytes ทีละก้อนซึ่งต้อง copy ทั้งก้อนใหม่ทุกรอบ (O(N^2))
+        final_stream = bytearray(total_len + 12 * chunks_count)
+        pos = 0
         
-        for item in chunk_list:
-            idx = item['index']
-            chunk_data = item['data']
+        for idx in order:
+            chunk_data = mv[idx * BLOCK_SIZE:(idx + 1) * BLOCK_SIZE]
             chunk_len = len(chunk_data)
             
             # Header ใหม่ (12 bytes): [SIG] + [Index] + [Len]
-            header = struct.pack('>4sII', StegoLogic.FRAG_SIG, idx, chunk_len)
-            
-            final_stream += header + chunk_data
+            FRAG_HDR.pack_into(final_stream, pos, StegoLogic.FRAG_SIG, idx, chunk_len)
+            final_stream[pos + 12:pos + 12 + chunk_len] = chunk_data
+            pos += 12 + chunk_len
             
-        return final_stream
+        return bytes(final_stream)
+
+    @staticmethod
+    def _shuffled_order(chunks_count):
+        """
+        สุ่มลำดับ Index ของชิ้นส่วน (สับเฉพาะเลข Index ไม่ต้องสร้าง dict ต่อชิ้น)
+        ใช้ SystemRandom (CSPRNG) เพราะลำดับชิ้นส่วนไม่ควรเดาได้
+        """
+        order = list(range(chunks_count))
+        random.SystemRandom().shuffle(order)
+        return order
+
+    @staticmethod
+    def write_fragmented(data, out_fh):
+        """
+        เหมือน fragment_payload แต่เขียน [Header][Data] ของแต่ละชิ้นลงไฟล์ทันที
+        ไม่ต้องสร้าง Stream ทั้งก้อนไว้ใน RAM
+        """
+        BLOCK_SIZE = StegoLogic.BLOCK_SIZE
+        mv = memoryview(data)
+        chunks_count = math.ceil(len(mv) / BLOCK_SIZE)
+        
+        for idx in StegoLogic._shuffled_order(chunks_count):
+            chunk_data = mv[idx * BLOCK_SIZE:(idx + 1) * BLOCK_SIZE]
+            out_fh.write(FRAG_HDR.pack(StegoLogic.FRAG_SIG, idx, len(chunk_data)))
+            out_fh.write(chunk_data)
 
     @staticmethod
     def defragment_payload(stream: bytes) -> bytes:
         """
         อ่านข้อมูล-> เก็บใส่ตะกร้า -> เรียงตามเลข Index -> รวมร่าง
         """
-        found_chunks = []
+        # เก็บแบบ 2 ลิสต์คู่ขนาน (Index / ช่วงข้อมูล) แทน dict ต่อชิ้น
+        indices = array.array('I')
+        spans = []
+        mv = memoryview(stream)
         cursor = 0
         stream_len = len(stream)
         
@@ -75,8 +138,8 @@ class StegoLogic:
             if cursor + 12 > stream_len: 
                 break
             
-            # อ่าน Header
-            sig, idx, length = struct.unpack('>4sII', stream[cursor:cursor+12])
+            # อ่าน Header (unpack_from อ่านตรงจาก stream ไม่ต้อง slice)
+            sig, idx, length = FRAG_HDR.unpack_from(stream, cursor)
             
             # ตรวจสอบลายเซ็น
             if sig != StegoLogic.FRAG_SIG:
@@ -91,24 +154,20 @@ class StegoLogic:
             if data_end > stream_len:
                 break # ข้อมูลไม่ครบ
                 
-            chunk_data = stream[data_start:data_end]
-            
-            # เก็บใส่ตะกร้าไว้ก่อน
-            found_chunks.append({
-                'index': idx,
-                'data': chunk_data
-            })
+            # เก็บใส่ตะกร้าไว้ก่อน (memoryview ไม่ copy ข้อมูล)
+            indices.append(idx)
+            spans.append(mv[data_start:data_end])
             
             # ขยับ Cursor ไปยังบล็อกถัดไป (ที่วางติดกันอยู่)
             cursor = data_end
             
-        if not found_chunks:
+        if not spans:
             return None
 
         # 2. *** เรียงลำดับ (Sort) ตาม Index ***
-        found_chunks.sort(key=lambda x: x['index'])
+        order = sorted(range(len(indices)), key=indices.__getitem__)
         
-        clean_data = b''.join([item['data'] for item in found_chunks])
+        clean_data = b''.join([spans[i] for i in order])
             
         return clean_data
 
@@ -120,6 +179,8 @@ class StegoLogic:
     def embed(app, locomotive_files, payload_path):
         """
         app: คือตัวแปร self จาก main.py เพื่อให้เราเข้าถึง txt_hide_img, txt_hide_secret ได้
+        งาน I/O ทั้งหมดถูกส่งไปทำใน QThreadPool เพื่อไม่ให้หน้าจอค้าง
+        (เลือกไฟล์/แสดงผลลัพธ์ยังทำบน GUI Thread)
         """
         img_list = locomotive_files
 
@@ -137,36 +198,55 @@ class StegoLogic:
             save_path, _ = QFileDialog.getSaveFileName(app, "บันทึกรูปภาพ", "", "PNG Image (*.png)")
             
             if save_path:
-                try:
-                    # 1. อ่านไฟล์ลับเข้า RAM
-                    with open(payload_path, 'rb') as f:
-                        secret_data = f.read()
-                    
-                    # 2. ทำ Fragmentation (หั่นแบบไม่มีขยะ)
-                    fragmented_data = StegoLogic.fragment_payload(secret_data)
-                    
-                    # 3. บันทึก
-                    success, msg = StegoLogic.hide_bytes_core(img_path, fragmented_data, save_path)
-                    
-                    if success:
-                        QMessageBox.information(app, "สำเร็จ", "ซ่อนและกระจายข้อมูล (Fragmented) เรียบร้อยแล้ว!")
-                    else:
-                        QMessageBox.critical(app, "ผิดพลาด", msg)
-                except Exception as e:
-                    QMessageBox.critical(app, "Error", str(e))
+                StegoLogic._start_job(
+                    app, "กำลังซ่อนข้อมูล...",
+                    lambda progress: StegoLogic._embed_single_job(img_path, payload_path, save_path),
+                )
 
         # --- CASE B: Multiple Files (Sharding) ---
         else:
             folder_path = QFileDialog.getExistingDirectory(app, "เลือกโฟลเดอร์สำหรับบันทึกไฟล์")
-            session_id = struct.unpack('>I', os.urandom(4))[0]
+            session_id = secrets.randbits(32)
             
             if not folder_path:
                 return
 
+            StegoLogic._start_job(
+                app, "กำลังกระจายข้อมูลลงในรูปภาพ...",
+                lambda progress: StegoLogic._embed_shards_job(
+                    img_list, payload_path, folder_path, session_id, progress
+                ),
+            )
+
+    @staticmethod
+    def _embed_single_job(img_path, payload_path, save_path):
+        """งานฝังแบบรูปเดียว (ทำงานใน Worker Thread) คืนค่า (level, title, text) สำหรับ QMessageBox"""
+        try:
+            # 1. Map ไฟล์ลับ (ไม่อ่านทั้งก้อนเข้า RAM)
+            mm, secret_data = StegoLogic._map_payload(payload_path)
+            
+            # 2-3. Copy รูป แล้วทำ Fragmentation เขียนต่อท้ายไฟล์ทันที
+            try:
+                success, msg = StegoLogic.hide_fragmented_core(img_path, secret_data, save_path)
+            finally:
+                secret_data.release()
+                if mm is not None:
+                    mm.close()
+            
+            if success:
+                return "information", "สำเร็จ", "ซ่อนและกระจายข้อมูล (Fragmented) เรียบร้อยแล้ว!"
+            return "critical", "ผิดพลาด", msg
+        except Exception as e:
+            return "critical", "Error", str(e)
+
+    @staticmethod
+    def _embed_shards_job(img_list, payload_path, folder_path, session_id, progress):
+        """งานฝังแบบหลายรูป (ทำงานใน Worker Thread) คืนค่า (level, title, text) สำหรับ QMessageBox"""
+        try:
+            # Map ไฟล์ลับเข้าหน่วยความจำ แล้วตัด Shard ผ่าน memoryview (ไม่ copy ข้อมูล)
+            mm, secret_data = StegoLogic._map_payload(payload_path)
+            
             try:
-                with open(payload_path, 'rb') as f:
-                    secret_data = f.read()
-                
                 total_size = len(secret_data)
                 n_images = len(img_list)
                 chunk_size = math.ceil(total_size / n_images)
@@ -174,40 +254,96 @@ class StegoLogic:
                 success_count = 0
                 errors = []
 
-                for i, img_path in enumerate(img_list):
-                    try:
-                        start = i * chunk_size
-                        end = start + chunk_size
-                        part_data = secret_data[start:end]
-
-                        header = struct.pack('>III', session_id,i, n_images) 
-                        final_payload = header + part_data
-
-                        base_name = os.path.basename(img_path)
-                        name_no_ext, _ = os.path.splitext(base_name)
-                        new_filename = f"{name_no_ext}.png"
-                        full_save_path = os.path.join(folder_path, new_filename)
-
-                        # เรียก Logic
-                        success, msg = StegoLogic.hide_bytes_core(img_path, final_payload, full_save_path)
-                        
+                # แต่ละรูปเป็นงาน I/O อิสระต่อกัน จึงเขียนพร้อมกันหลาย Thread ได้
+                # (GIL ถูกปล่อยระหว่าง read/write) ผลลัพธ์คืนตามลำดับรูปเดิม
+                # ตั้งชื่อไฟล์ผลลัพธ์ให้ไม่ซ้ำกันก่อนส่งงาน (กัน 2 Thread เขียนไฟล์เดียวกัน)
+                save_paths = StegoLogic._shard_save_paths(img_list, folder_path)
+                max_workers = min(StegoLogic.MAX_EMBED_WORKERS, n_images)
+                with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                    results = pool.map(
+                        lambda job: StegoLogic._embed_one(
+                            job[0], job[1], session_id, n_images, secret_data, chunk_size, save_paths[job[0]]
+                        ),
+                        enumerate(img_list),
+                    )
+                    for done, (success, msg, label) in enumerate(results, start=1):
                         if success:
                             success_count += 1
                         else:
-                            errors.append(f"{base_name}: {msg}")
+                            errors.append(f"{label}: {msg}")
+                        progress(done, n_images)
+            finally:
+                secret_data.release()
+                if mm is not None:
+                    mm.close()
+
+            result_msg = f"กระจายข้อมูลลับลงใน {success_count} จาก {n_images} รูปเรียบร้อยแล้ว"
+            if errors:
+                result_msg += "\n\nพบปัญหาบางไฟล์:\n" + "\n".join(errors)
+                return "warning", "เสร็จสิ้น (มีข้อผิดพลาด)", result_msg
+            return "information", "เสร็จสิ้นสมบูรณ์", result_msg
+
+        except Exception as e_outer:
+            return "critical", "Critical Error", f"เกิดข้อผิดพลาดร้ายแรงในการอ่านไฟล์ลับ: {str(e_outer)}"
 
-                    except Exception as e_inner:
-                        errors.append(f"{img_path}: {str(e_inner)}")
+    @staticmethod
+    def _map_payload(payload_path):
+        """
+        เปิดไฟล์ลับแบบ mmap (อ่านอย่างเดียว)
+        Returns: (mm, view) โดย mm เป็น None ถ้าไฟล์ว่าง (mmap ไฟล์ขนาด 0 ไม่ได้)
+        ผู้เรียกต้อง release view และ close mm เมื่อใช้เสร็จ
+        """
+        with open(payload_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None, memoryview(b'')
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mm, memoryview(mm)
 
-                result_msg = f"กระจายข้อมูลลับลงใน {success_count} จาก {n_images} รูปเรียบร้อยแล้ว"
-                if errors:
-                    result_msg += "\n\nพบปัญหาบางไฟล์:\n" + "\n".join(errors)
-                    QMessageBox.warning(app, "เสร็จสิ้น (มีข้อผิดพลาด)", result_msg)
-                else:
-                    QMessageBox.information(app, "เสร็จสิ้นสมบูรณ์", result_msg)
+    @staticmethod
+    def _shard_save_paths(img_list, folder_path):
+        """
+        Path ผลลัพธ์ของแต่ละ Shard: {ชื่อรูป}.png เหมือนเดิม
+        ถ้าชื่อซ้ำกัน (เช่น a.png กับ a.jpg หรือคนละโฟลเดอร์) ต่อท้ายด้วยลำดับ Shard -> {ชื่อรูป}_{i+1}.png
+        """
+        names = [os.path.splitext(os.path.basename(p))[0] for p in img_list]
+        counts = {}
+        for name in names:
+            counts[name.lower()] = counts.get(name.lower(), 0) + 1
+
+        used = set()
+        paths = []
+        for i, name in enumerate(names):
+            candidate = name if counts[name.lower()] == 1 else f"{name}_{i + 1}"
+            # กันชนกับชื่อรูปอื่นที่บังเอิญเป็นรูปแบบเดียวกัน (เช่นมีรูปชื่อ a_2 อยู่แล้ว)
+            while candidate.lower() in used:
+                candidate = f"{candidate}_{i + 1}"
+            used.add(candidate.lower())
+            paths.append(os.path.join(folder_path, f"{candidate}.png"))
+        return paths
 
-            except Exception as e_outer:
-                QMessageBox.critical(app, "Critical Error", f"เกิดข้อผิดพลาดร้ายแรงในการอ่านไฟล์ลับ: {str(e_outer)}")
+    @staticmethod
+    def _embed_one(i, img_path, session_id, n_images, secret_data, chunk_size, full_save_path):
+        """
+        ฝัง Shard ที่ i ลงในรูป img_path (ทำงานใน Worker Thread)
+        Returns: (success, msg, label) โดย label ใช้แสดงในรายการข้อผิดพลาด
+        """
+        try:
+            start = i * chunk_size
+            end = start + chunk_size
+            part_data = secret_data[start:end]
+
+            # ส่ง Header กับข้อมูลแยกกัน ให้ hide_bytes_core เขียนต่อกันเอง (ไม่ต้องต่อ bytes ใหม่)
+            header = SESSION_HDR.pack(session_id, i, n_images) 
+            final_payload = (header, part_data)
+
+            base_name = os.path.basename(img_path)
+
+            # เรียก Logic
+            success, msg = StegoLogic.hide_bytes_core(img_path, final_payload, full_save_path)
+            return success, msg, base_name
+
+        except Exception as e_inner:
+            return False, str(e_inner), img_path
 
     @staticmethod
     def run_extract(app):
@@ -221,91 +357,177 @@ class StegoLogic:
         save_path, _ = QFileDialog.getSaveFileName(app, "ตั้งชื่อไฟล์ผลลัพธ์", "", "All Files (*)")
         if not save_path: return
 
+        # --- CASE A: ไฟล์เดียว (Modified for Defragmentation) ---
+        if len(img_list) == 1:
+            img_path = img_list[0]
+            StegoLogic._start_job(
+                app, "กำลังถอดข้อมูล...",
+                lambda progress: StegoLogic._extract_single_job(img_path, save_path),
+            )
+
+        # --- CASE B: หลายไฟล์ (Reassembling) ---
+        else:
+            # อ่านทุกรูปใน Worker ก่อน แล้วค่อยกลับมาถาม/ตรวจจำนวนบน GUI Thread
+            StegoLogic._start_job(
+                app, "กำลังอ่านชิ้นส่วนข้อมูล...",
+                lambda progress: StegoLogic._collect_shards_job(img_list, progress),
+                on_done=lambda result: StegoLogic._on_shards_collected(app, save_path, result),
+            )
+
+    @staticmethod
+    def _extract_single_job(img_path, save_path):
+        """งานถอดแบบรูปเดียว (ทำงานใน Worker Thread) คืนค่า (level, title, text) สำหรับ QMessageBox"""
+        try:
+            payload, msg = StegoLogic.get_raw_payload_core(img_path)
+            
+            if not payload:
+                return "critical", "ผิดพลาด", msg
+
+            # พยายามรวมชิ้นส่วน (Defragment)
+            real_data = StegoLogic.defragment_payload(payload)
+            
+            if not real_data:
+                # Fallback: ถ้า Defrag ไม่ได้ (อาจเป็นไฟล์แบบเก่า)
+                return "warning", "เตือน", "ไม่พบโครงสร้างข้อมูลแบบ Fragmented หรือข้อมูลเสียหาย"
+
+            with open(save_path, 'wb') as f: f.write(real_data)
+            return "information", "สำเร็จ", f"รวมข้อมูลและบันทึกที่: {save_path}"
+        except Exception as e:
+            return "critical", "Error", f"เกิดข้อผิดพลาด: {str(e)}"
+
+    @staticmethod
+    def _collect_shards_job(img_list, progress):
+        """
+        อ่าน Shard จากทุกรูป (ทำงานใน Worker Thread)
+        Returns: dict {'datas': [...เรียงตาม Index แล้ว], 'total': จำนวนที่ควรมี}
+                 หรือ (level, title, text) ถ้าไม่พบข้อมูลเลย
+        """
         try:
-            # --- CASE A: ไฟล์เดียว (Modified for Defragmentation) ---
-            if len(img_list) == 1:
-                img_path = img_list[0]
+            # เก็บแบบลิสต์คู่ขนาน (Index / Total / Data) แทน dict ต่อชิ้น
+            part_indices = []
+            part_totals = []
+            part_datas = []
+            errors = []
+            
+            expected_session_id = None
+
+            for n_read, img_path in enumerate(img_list, start=1):
+                progress(n_read - 1, len(img_list))
+                base_name = os.path.basename(img_path)
                 payload, msg = StegoLogic.get_raw_payload_core(img_path)
                 
                 if payload:
-                    # พยายามรวมชิ้นส่วน (Defragment)
-                    real_data = StegoLogic.defragment_payload(payload)
-                    
-                    if not real_data:
-                        # Fallback: ถ้า Defrag ไม่ได้ (อาจเป็นไฟล์แบบเก่า)
-                        QMessageBox.warning(app, "เตือน", "ไม่พบโครงสร้างข้อมูลแบบ Fragmented หรือข้อมูลเสียหาย")
-                        return
-
-                    with open(save_path, 'wb') as f: f.write(real_data)
-                    QMessageBox.information(app, "สำเร็จ", f"รวมข้อมูลและบันทึกที่: {save_path}")
+                    try:
+                        # *** เช็ก Header 8 bytes ***
+                        if len(payload) >= 12:
+
+                            sess_id, index, total_count = SESSION_HDR.unpack_from(payload)
+                            content = memoryview(payload)[12:]
+                            
+                            if expected_session_id is None:
+                                expected_session_id = sess_id
+                                
+                            if sess_id != expected_session_id:
+                                errors.append(f"{base_name}: Session ID ไม่ตรง (คนละชุดข้อมูล)")
+                                continue
+                            
+                            part_indices.append(index)
+                            part_totals.append(total_count)
+                            part_datas.append(content)
+                        else:
+                            errors.append(f"{base_name}: ข้อมูลสั้นเกินไป (ไม่พบ Header)")
+                    except Exception as e:
+                        errors.append(f"{base_name}: Header Error ({e})")
                 else:
-                    QMessageBox.critical(app, "ผิดพลาด", msg)
+                    errors.append(f"{base_name}: {msg}")
 
-            # --- CASE B: หลายไฟล์ (Reassembling) ---
-            else:
-                found_parts = []
-                errors = []
-                
-                expected_session_id = None
-
-                for img_path in img_list:
-                    base_name = os.path.basename(img_path)
-                    payload, msg = StegoLogic.get_raw_payload_core(img_path)
-                    
-                    if payload:
-                        try:
-                            # *** เช็ก Header 8 bytes ***
-                            if len(payload) >= 12:
-
-                                sess_id, index, total_count = struct.unpack('>III', payload[:12])
-                                content = payload[12:]
-                                
-                                if expected_session_id is None:
-                                    expected_session_id = sess_id
-                                    
-                                if sess_id != expected_session_id:
-                                    errors.append(f"{base_name}: Session ID ไม่ตรง (คนละชุดข้อมูล)")
-                                    continue
-                                
-                                found_parts.append({
-                                    'index': index,
-                                    'total': total_count,
-                                    'data': content,
-                                    'filename': base_name
-                                })
-                            else:
-                                errors.append(f"{base_name}: ข้อมูลสั้นเกินไป (ไม่พบ Header)")
-                        except Exception as e:
-                            errors.append(f"{base_name}: Header Error ({e})")
-                    else:
-                        errors.append(f"{base_name}: {msg}")
-
-                if not found_parts:
-                    QMessageBox.critical(app, "ล้มเหลว", "ไม่พบข้อมูลในไฟล์ที่เลือกเลย")
-                    return
-                
-                # เรียงลำดับตาม Index
-                found_parts.sort(key=lambda x: x['index'])
+            if not part_datas:
+                return "critical", "ล้มเหลว", "ไม่พบข้อมูลในไฟล์ที่เลือกเลย"
+            
+            # เรียงลำดับตาม Index (เรียงเฉพาะตำแหน่ง ไม่ต้องย้ายข้อมูล)
+            order = sorted(range(len(part_indices)), key=part_indices.__getitem__)
+
+            return {
+                'datas': [part_datas[i] for i in order],
+                'total': part_totals[order[0]],
+            }
+        except Exception as e:
+            return "critical", "Error", f"เกิดข้อผิดพลาด: {str(e)}"
 
-                # เช็กจำนวน
-                expected_total = found_parts[0]['total'] 
-                current_count = len(found_parts)
+    @staticmethod
+    def _on_shards_collected(app, save_path, result):
+        """ตรวจจำนวน Shard บน GUI Thread (อาจต้องถามผู้ใช้) แล้วส่งงานเขียนไฟล์ต่อ"""
+        if not isinstance(result, dict):
+            StegoLogic._show_result(app, result)
+            return
 
-                if current_count != expected_total:
-                    msg = f"ชิ้นส่วนไม่ครบ!\nเจอ {current_count} ส่วน จากที่ควรมี {expected_total} ส่วน\n\nไฟล์ที่ได้อาจจะไม่สมบูรณ์ ต้องการทำต่อหรือไม่?"
-                    reply = QMessageBox.question(app, "Warning", msg, QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-                    if reply == QMessageBox.StandardButton.No: return
+        # เช็กจำนวน
+        part_datas = result['datas']
+        expected_total = result['total'] 
+        current_count = len(part_datas)
 
-                # รวมร่าง
-                full_data = b''.join([part['data'] for part in found_parts])
+        if current_count != expected_total:
+            msg = f"ชิ้นส่วนไม่ครบ!\nเจอ {current_count} ส่วน จากที่ควรมี {expected_total} ส่วน\n\nไฟล์ที่ได้อาจจะไม่สมบูรณ์ ต้องการทำต่อหรือไม่?"
+            reply = QMessageBox.question(app, "Warning", msg, QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            if reply == QMessageBox.StandardButton.No: return
 
-                with open(save_path, 'wb') as f:
-                    f.write(full_data)
-                
-                QMessageBox.information(app, "สำเร็จ", "รวมไฟล์และบันทึกสำเร็จ!")
+        StegoLogic._start_job(
+            app, "กำลังรวมไฟล์...",
+            lambda progress: StegoLogic._write_joined_job(part_datas, save_path),
+        )
 
+    @staticmethod
+    def _write_joined_job(part_datas, save_path):
+        """รวมร่าง Shard แล้วเขียนไฟล์ (ทำงานใน Worker Thread)"""
+        try:
+            with open(save_path, 'wb') as f:
+                f.write(b''.join(part_datas))
+            return "information", "สำเร็จ", "รวมไฟล์และบันทึกสำเร็จ!"
         except Exception as e:
-            QMessageBox.critical(app, "Error", f"เกิดข้อผิดพลาด: {str(e)}")
+            return "critical", "Error", f"เกิดข้อผิดพลาด: {str(e)}"
+
+    # =========================================================
+    # BACKGROUND JOBS (QThreadPool)
+    # =========================================================
+
+    # เก็บ Job ที่กำลังทำงานไว้ ไม่ให้ถูก Garbage Collect ก่อนส่ง Signal กลับ
+    _active_jobs = set()
+
+    @staticmethod
+    def _start_job(app, label, fn, on_done=None):
+        """
+        ส่ง fn(progress) ไปทำงานใน QThreadPool พร้อมแสดง QProgressDialog
+        เมื่อเสร็จจะเรียก on_done(result) บน GUI Thread
+        (ค่าเริ่มต้น: แสดงผลลัพธ์ (level, title, text) ด้วย QMessageBox)
+        """
+        dialog = QProgressDialog(label, None, 0, 0, app)
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(0)
+        dialog.show()
+
+        job = StegoJob(fn)
+        StegoLogic._active_jobs.add(job)
+
+        def handle_progress(done, total):
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+
+        def handle_finished(result):
+            StegoLogic._active_jobs.discard(job)
+            dialog.close()
+            if on_done is None:
+                StegoLogic._show_result(app, result)
+            else:
+                on_done(result)
+
+        job.signals.progress.connect(handle_progress)
+        job.signals.finished.connect(handle_finished)
+        QThreadPool.globalInstance().start(job)
+
+    @staticmethod
+    def _show_result(app, result):
+        level, title, text = result
+        getattr(QMessageBox, level)(app, title, text)
 
     # =========================================================
     # ส่วนที่ 2: CORE LOGIC (การคำนวณไบนารีล้วนๆ)
@@ -314,13 +536,12 @@ class StegoLogic:
     @staticmethod
     def hide_file_core(carrier_path, secret_path, output_path):
         try:
-            with open(carrier_path, 'rb') as f_img:
-                img_data = f_img.read()
-            with open(secret_path, 'rb') as f_secret:
-                secret_data = f_secret.read()
-            new_data = img_data + secret_data
+            # Stream ทั้งรูปและไฟล์ลับลงไฟล์ผลลัพธ์ทีละช่วง ไม่ต้องโหลดทั้งก้อนเข้า RAM
             with open(output_path, 'wb') as f_out:
-                f_out.write(new_data)
+                with open(carrier_path, 'rb') as f_img:
+                    copy_carrier(f_img, f_out)
+                with open(secret_path, 'rb') as f_secret:
+                    shutil.copyfileobj(f_secret, f_out, StegoLogic.COPY_BUFSIZE)
             return True, "Success"
         except Exception as e:
             return False, str(e)
@@ -328,34 +549,86 @@ class StegoLogic:
     @staticmethod    
     def hide_bytes_core(carrier_path, secret_data_bytes, output_path):
         try:
-            with open(carrier_path, 'rb') as f_img:
-                img_data = f_img.read()
-            new_data = img_data + secret_data_bytes
-            with open(output_path, 'wb') as f_out:
-                f_out.write(new_data)
+            # Copy รูปต้นฉบับแบบ Stream แล้วค่อยเขียนข้อมูลลับต่อท้าย
+            # (ไม่ต้องอ่านรูปทั้งไฟล์ + ต่อ bytes ก้อนใหม่ใน RAM)
+            with open(carrier_path, 'rb') as f_img, open(output_path, 'wb') as f_out:
+                copy_carrier(f_img, f_out)
+                # รับได้ทั้ง bytes-like ก้อนเดียว หรือ tuple/list ของหลายชิ้น (เช่น Header + Data)
+                if isinstance(secret_data_bytes, (tuple, list)):
+                    for part in secret_data_bytes:
+                        f_out.write(part)
+                else:
+                    f_out.write(secret_data_bytes)
             return True, "Success"
         except Exception as e:
             return False, str(e)
     
+    @staticmethod
+    def hide_fragmented_core(carrier_path, secret_data, output_path):
+        try:
+            # Copy รูปต้นฉบับแบบ Stream แล้วเขียนข้อมูลลับแบบ Fragment ต่อท้ายทีละชิ้น
+            with open(carrier_path, 'rb') as f_img, open(output_path, 'wb') as f_out:
+                copy_carrier(f_img, f_out)
+                StegoLogic.write_fragmented(secret_data, f_out)
+            return True, "Success"
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    def _find_png_end(f):
+        """
+        คืนค่า offset หลัง IEND (จุดเริ่มข้อมูลที่ซ่อน) หรือ -1 ถ้าไม่เจอ
+        1. เดินตาม Chunk Header แล้ว seek ข้ามข้อมูลแต่ละ Chunk (อ่านแค่ 8 byte ต่อ Chunk)
+           (ไม่ใช้ rfind จากท้ายไฟล์ เพราะข้อมูลที่ซ่อนอาจมี IEND ของ PNG อื่นอยู่ข้างใน)
+        2. ถ้าโครงสร้างไม่ตรง -> อ่านทีละ 1 MiB จากต้นไฟล์เพื่อหา IEND ตัวแรก
+        """
+        size = os.fstat(f.fileno()).st_size
+        if f.read(8) == PNG_FILE_SIG:
+            pos = 8
+            while pos + 12 <= size:
+                length, chunk_type = CHUNK_HDR.unpack(f.read(8))
+                end = pos + 12 + length  # Length(4) + Type(4) + Data + CRC(4)
+                if chunk_type == b'IEND':
+                    if end <= size: return end
+                    break
+                pos = end
+                f.seek(pos)
+        f.seek(0)
+        
+        sig = StegoLogic.PNG_EOF_SIG
+        overlap = len(sig) - 1
+        tail = b''
+        base = 0  # offset ในไฟล์ของ byte แรกใน window
+        while True:
+            block = f.read(StegoLogic.COPY_BUFSIZE)
+            if not block:
+                return -1
+            window = tail + block
+            idx = window.find(sig)
+            if idx != -1:
+                return base + idx + len(sig)
+            # เก็บท้าย window ไว้เผื่อ signature คร่อมรอยต่อระหว่างบล็อก
+            keep = min(overlap, len(window))
+            base += len(window) - keep
+            tail = window[len(window) - keep:]
+
     @staticmethod
     def get_raw_payload_core(stego_image_path):
         try:
             with open(stego_image_path, 'rb') as f:
-                all_data = f.read()
-            
-            # 1. หาจุดสิ้นสุดของ PNG (IEND)
-            eof_index = all_data.find(StegoLogic.PNG_EOF_SIG)
-            if eof_index == -1:
-                return None, "ไม่ใช่ไฟล์ PNG หรือไฟล์เสียหาย"
-            
-            # 2. คำนวณจุดเริ่มต้นข้อมูลที่ซ่อน
-            split_point = eof_index + len(StegoLogic.PNG_EOF_SIG)
+                # 1. หาจุดสิ้นสุดของ PNG (IEND) โดยไม่ต้องอ่านทั้งไฟล์เข้า RAM
+                split_point = StegoLogic._find_png_end(f)
+                if split_point == -1:
+                    return None, "ไม่ใช่ไฟล์ PNG หรือไฟล์เสียหาย"
+                
+                # 2. อ่านเฉพาะข้อมูลที่ซ่อนต่อท้าย
+                f.seek(split_point)
+                secret_data = f.read()
             
             # 3. ถ้าไม่มีข้อมูลต่อท้ายเลย
-            if split_point >= len(all_data):
+            if not secret_data:
                 return None, "ไม่พบข้อมูลซ่อนอยู่"
             
-            secret_data = all_data[split_point:]
             return secret_data, "Success"
         except Exception as e:
             return None, str(e)
\ No newline at end of file
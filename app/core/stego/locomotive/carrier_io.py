@@ -0,0 +1,43 @@
+import os
+import shutil
+import struct
+
+# Header ที่ compile format ไว้ครั้งเดียว (ไม่ต้อง parse format string ทุกครั้งที่เรียก)
+# ใช้ร่วมกันระหว่าง Locomotive และ V4 (รูปแบบไฟล์ต้องตรงกันทั้งสองฝั่ง)
+FRAG_HDR = struct.Struct('>4sII')    # [FRAG][Index][Length]
+SESSION_HDR = struct.Struct('>III')  # [Session ID][Index][Total]
+CHUNK_HDR = struct.Struct('>I4s')    # PNG Chunk: [Length][Type]
+PNG_FILE_SIG = b'\x89PNG\r\n\x1a\n'
+
+COPY_BUFSIZE = 1 << 20  # 1 MiB ต่อรอบเวลา copy/อ่านไฟล์แบบ Stream
+
+
+def copy_carrier(f_src, f_dst):
+    """
+    copy รูปต้นฉบับทั้งไฟล์ลง f_dst
+    ใช้ os.sendfile (copy ภายใน kernel ไม่ผ่าน Python) ถ้ามี ไม่งั้นใช้ copyfileobj
+    """
+    src_fd = f_src.fileno()
+    dst_fd = f_dst.fileno()
+    size = os.fstat(src_fd).st_size
+    offset = 0
+
+    # บอก Kernel ว่าจะอ่านเรียงต่อกันทั้งไฟล์ -> เพิ่ม read-ahead
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+    if hasattr(os, 'sendfile'):
+        try:
+            while offset < size:
+                sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                if sent == 0: break
+                offset += sent
+            return
+        except OSError:
+            # บาง File System ไม่รองรับ sendfile -> ถ้ายังไม่ได้เขียนอะไรเลยให้ fallback
+            if offset: raise
+
+    shutil.copyfileobj(f_src, f_dst, COPY_BUFSIZE)
@@ -1,10 +1,15 @@
 import os
+import functools
 import math
-import struct
+import mmap
 import random
+import secrets
 import time
 from typing import List, Optional, Callable
 
+import numpy as np
+from numba import njit
+
 # --- Crypto Imports (ใช้ชุดเดียวกับ LSB++ เพื่อความปลอดภัย) ---
 from app.core.crypto.sym_crypto import (
     derive_key_argon2id, 
@@ -16,10 +21,76 @@ from app.core.crypto.asym_crypto import (
     rsa_encrypt_key
 )
 
+# --- Header / Carrier Copy (ใช้ร่วมกับ V4) ---
+from app.core.stego.locomotive.carrier_io import (
+    FRAG_HDR,
+    SESSION_HDR,
+    CHUNK_HDR,
+    PNG_FILE_SIG,
+    COPY_BUFSIZE,
+    copy_carrier
+)
+
+
+@njit(cache=True)
+def _next_fragment(buf, sig, cursor):
+    """
+    อ่าน Header ของ Fragment ที่ cursor
+    Returns: (data_start, length, index) หรือ length = -1 ถ้า SIG ไม่ตรง/ข้อมูลขาด
+    """
+    n = buf.shape[0]
+    if cursor + 12 > n:
+        return 0, -1, 0
+    if (buf[cursor] != sig[0] or buf[cursor + 1] != sig[1]
+            or buf[cursor + 2] != sig[2] or buf[cursor + 3] != sig[3]):
+        return 0, -1, 0
+    idx = ((np.int64(buf[cursor + 4]) << 24) | (np.int64(buf[cursor + 5]) << 16)
+           | (np.int64(buf[cursor + 6]) << 8) | np.int64(buf[cursor + 7]))
+    length = ((np.int64(buf[cursor + 8]) << 24) | (np.int64(buf[cursor + 9]) << 16)
+              | (np.int64(buf[cursor + 10]) << 8) | np.int64(buf[cursor + 11]))
+    data_start = cursor + 12
+    if data_start + length > n:
+        return 0, -1, 0
+    return data_start, length, idx
+
+@njit(cache=True)
+def _scan_fragments(buf, sig):
+    """
+    เดิน Stream หา Fragment ที่ต่อกันตั้งแต่ต้น (หยุดเมื่อ SIG ไม่ตรงหรือข้อมูลขาด)
+    Returns: (offsets, lengths, indices) ของข้อมูลแต่ละชิ้น
+    """
+    # [Optimize] รอบแรกนับจำนวน Fragment (อ่านแค่ Header) แล้วจอง Array พอดี
+    count = 0
+    cursor = 0
+    while True:
+        data_start, length, idx = _next_fragment(buf, sig, cursor)
+        if length < 0:
+            break
+        count += 1
+        cursor = data_start + length
+
+    offs = np.empty(count, dtype=np.int64)
+    lens = np.empty(count, dtype=np.int64)
+    idxs = np.empty(count, dtype=np.int64)
+    cursor = 0
+    for k in range(count):
+        data_start, length, idx = _next_fragment(buf, sig, cursor)
+        offs[k] = data_start
+        lens[k] = length
+        idxs[k] = idx
+        cursor = data_start + length
+    return offs, lens, idxs
+
+@functools.lru_cache(maxsize=16)
+def _load_public_key_cached(path: str, mtime: float):
+    """โหลด Public Key (PEM) แบบ cache ต่อ (path, mtime) -> ถ้าไฟล์ถูกแก้ mtime เปลี่ยนจะโหลดใหม่"""
+    return load_public_key_pem(path)
+
 class Locomotive:
     
     PNG_EOF_SIG = b'\x00\x00\x00\x00IEND\xaeB`\x82'
     FRAG_SIG = b'FRAG' 
+    COPY_BUFSIZE = COPY_BUFSIZE  # 1 MiB ต่อรอบ (ค่าเดียวกับ carrier_io)
     
     # =========================================================
     # 1. MAIN INTERFACE (เรียกโดย EmbedWorker)
@@ -66,8 +137,9 @@ class Locomotive:
             cover_path = cover_paths[0]
             
             # Logic เดิม: Fragment -> Shuffle
+            # (สร้างทีละชิ้นตอนเขียนไฟล์ ไม่ต้องมี Stream ทั้งก้อนใน RAM)
             update("Fragmenting & Shuffling...", 40)
-            fragmented_data = self.fragment_payload(final_payload)
+            fragment_parts = self.fragment_payload_iter(final_payload)
             
             # สร้างชื่อไฟล์ผลลัพธ์
             filename = os.path.basename(cover_path)
@@ -76,7 +148,7 @@ class Locomotive:
             
             # ฝังข้อมูล
             update("Embedding data...", 70)
-            success, msg = self.hide_bytes_core(cover_path, fragmented_data, save_path)
+            success, msg = self.hide_stream_core(cover_path, fragment_parts, save_path)
             
             if not success:
                 raise Exception(f"Embedding failed: {msg}")
@@ -91,7 +163,8 @@ class Locomotive:
             total_size = len(final_payload)
             chunk_size = math.ceil(total_size / n_images)
             
-            session_id = struct.unpack('>I', os.urandom(4))[0]
+            session_id = secrets.randbits(32)
+            payload_view = memoryview(final_payload)
             
             for i, img_path in enumerate(cover_paths):
                 # Update progress ตามจำนวนรูป
@@ -101,11 +174,12 @@ class Locomotive:
                 # ตัดแบ่งข้อมูล
                 start = i * chunk_size
                 end = start + chunk_size
-                part_data = final_payload[start:end]
+                part_data = payload_view[start:end]
 
                 # Header Sharding: [SessionID] [Index] [Total]
-                header = struct.pack('>III', session_id, i, n_images) 
-                chunk_final = header + part_data
+                # ส่ง Header กับข้อมูลแยกกัน ให้ hide_bytes_core เขียนต่อกันเอง (ไม่ต้องต่อ bytes ใหม่)
+                header = SESSION_HDR.pack(session_id, i, n_images) 
+                chunk_final = (header, part_data)
 
                 # สร้างชื่อไฟล์
                 base_name = os.path.basename(img_path)
@@ -128,6 +202,20 @@ class Locomotive:
     
     def _encrypt_data(self, data: bytes, mode: str, pwd: str, pub_key: str) -> bytes:
         """เข้ารหัสข้อมูลก่อนนำไป Fragment/Shard"""
+        return self.encrypt_batch([data], mode, pwd, pub_key)[0]
+
+    def encrypt_batch(
+        self,
+        items: List[bytes],
+        mode: str,
+        pwd: Optional[str] = None,
+        pub_key: Optional[str] = None,
+    ) -> List[bytes]:
+        """
+        เข้ารหัสหลาย Payload ในครั้งเดียว: Derive Key (Argon2id) / โหลด Public Key แค่ครั้งเดียว
+        แล้วเข้ารหัสแต่ละชิ้นด้วย AES-GCM พร้อม Nonce ใหม่ทุกชิ้น
+        Returns: List ของ Payload ที่เข้ารหัสแล้ว (รูปแบบเดียวกับ _encrypt_data)
+        """
         mode = (mode or "none").lower()
         
         # ใส่ Header เล็กๆ เพื่อระบุโหมดการเข้ารหัส [Mode Byte] + [Data]
@@ -137,114 +225,144 @@ class Locomotive:
             if not pwd: raise ValueError("Password required")
             salt = generate_salt()
             key = derive_key_argon2id(pwd, salt)
-            nonce, ciphertext = aes_gcm_encrypt(key, data)
             # Format: [0x01] [SALT(16)] [NONCE(12)] [CIPHERTEXT]
-            return b'\x01' + salt + nonce + ciphertext
+            prefix = b'\x01' + salt
+            return [prefix + b''.join(aes_gcm_encrypt(key, data)) for data in items]
             
         elif mode == "public":
             if not pub_key: raise ValueError("Public Key required")
-            pk = load_public_key_pem(pub_key)
+            pk = _load_public_key_cached(pub_key, os.path.getmtime(pub_key))
             sym_key = generate_salt(32) # Ephemeral Key
             ek = rsa_encrypt_key(pk, sym_key)
-            nonce, ct = aes_gcm_encrypt(sym_key, data)
             # Format: [0x02] [EK_LEN(2)] [EK] [NONCE(12)] [CIPHERTEXT]
-            return b'\x02' + len(ek).to_bytes(2, 'big') + ek + nonce + ct
+            prefix = b'\x02' + len(ek).to_bytes(2, 'big') + ek
+            return [prefix + b''.join(aes_gcm_encrypt(sym_key, data)) for data in items]
             
         else:
             # Format: [0x00] [DATA]
-            return b'\x00' + data
+            return [b'\x00' + data for data in items]
 
     @staticmethod
     def fragment_payload(data: bytes) -> bytes:
         """
         หั่นข้อมูล -> แปะเบอร์ลำดับ -> สับตำแหน่ง (Shuffle)
         Structure: [SIG(4)][Index(4)][Len(4)] + [Data]
+        (ต่อผลจาก fragment_payload_iter เป็นก้อนเดียว -> ใช้ Logic หั่น/สับชุดเดียวกับตอน Embed)
         """
-        BLOCK_SIZE = 4096 
-        total_len = len(data)
-        chunks_count = math.ceil(total_len / BLOCK_SIZE)
+        return b''.join([part for frag in Locomotive.fragment_payload_iter(data) for part in frag])
+
+    @staticmethod
+    def fragment_payload_iter(data: bytes, block_size: int = 4096):
+        """
+        แบบ Generator ของ fragment_payload: yield (Header, Data) ทีละชิ้นตามลำดับที่สับแล้ว
+        Data เป็น memoryview slice ของ data (ไม่ copy) -> ผลรวมเท่ากับ fragment_payload ทุกประการ
+        """
+        mv = memoryview(data)
+        total_len = len(mv)
+        chunks_count = math.ceil(total_len / block_size)
         
-        chunk_list = []
+        order = list(range(chunks_count))
+        random.SystemRandom().shuffle(order)
         
-        for i in range(chunks_count):
-            start = i * BLOCK_SIZE
-            end = start + BLOCK_SIZE
-            chunk_data = data[start:end]
-            
-            chunk_list.append({
-                'index': i,
-                'data': chunk_data
-            })
-            
-        random.shuffle(chunk_list)
-        
-        final_stream = b''
-        for item in chunk_list:
-            idx = item['index']
-            chunk_data = item['data']
-            chunk_len = len(chunk_data)
-            
-            # ใช้ Locomotive.FRAG_SIG หรือ self.FRAG_SIG
-            header = struct.pack('>4sII', Locomotive.FRAG_SIG, idx, chunk_len)
-            final_stream += header + chunk_data
-            
-        return final_stream
+        for idx in order:
+            start = idx * block_size
+            end = min(start + block_size, total_len)
+            yield FRAG_HDR.pack(Locomotive.FRAG_SIG, idx, end - start), mv[start:end]
 
     @staticmethod
     def defragment_payload(stream: bytes) -> bytes:
-        found_chunks = []
-        cursor = 0
-        stream_len = len(stream)
+        # Offset / Length / Index เป็น Array คู่ขนาน (ไม่สร้าง dict ต่อชิ้น)
+        # Data เป็น memoryview slice (ไม่ copy จนถึงตอน join)
+        mv = memoryview(stream)
         
-        while cursor < stream_len:
-            if cursor + 12 > stream_len: break
-            
-            sig, idx, length = struct.unpack('>4sII', stream[cursor:cursor+12])
-            
-            if sig != Locomotive.FRAG_SIG: break
-            
-            data_start = cursor + 12
-            data_end = data_start + length
-            
-            if data_end > stream_len: break
-                
-            chunk_data = stream[data_start:data_end]
-            found_chunks.append({'index': idx, 'data': chunk_data})
-            cursor = data_end
-            
-        if not found_chunks: return None
-
-        found_chunks.sort(key=lambda x: x['index'])
-        return b''.join([item['data'] for item in found_chunks])
+        # [Optimize] สแกน Header ทั้งหมดใน nopython แล้วค่อยตัด slice ใน Python
+        offs, lens, idxs = _scan_fragments(
+            np.frombuffer(stream, dtype=np.uint8),
+            np.frombuffer(Locomotive.FRAG_SIG, dtype=np.uint8),
+        )
+        if len(idxs) == 0: return None
+        order = np.argsort(idxs, kind='stable').tolist()
+        offs = offs.tolist()
+        lens = lens.tolist()
+        return b''.join([mv[offs[i]:offs[i] + lens[i]] for i in order])
 
     @staticmethod    
     def hide_bytes_core(carrier_path, secret_data_bytes, output_path):
         try:
-            with open(carrier_path, 'rb') as f_img:
-                img_data = f_img.read()
-            new_data = img_data + secret_data_bytes
-            with open(output_path, 'wb') as f_out:
-                f_out.write(new_data)
+            with open(carrier_path, 'rb') as f_img, open(output_path, 'wb') as f_out:
+                # 1. copy รูปต้นฉบับ (ไม่ต้องอ่านทั้งไฟล์เข้า RAM หรือต่อ bytes ใหม่)
+                copy_carrier(f_img, f_out)
+                # 2. เขียนข้อมูลลับต่อท้าย
+                # รับได้ทั้ง bytes-like ก้อนเดียว หรือ tuple/list ของหลายชิ้น (เช่น Header + Data)
+                if isinstance(secret_data_bytes, (tuple, list)):
+                    for part in secret_data_bytes:
+                        f_out.write(part)
+                else:
+                    f_out.write(secret_data_bytes)
             return True, "Success"
         except Exception as e:
             return False, str(e)
     
+    @staticmethod
+    def hide_stream_core(carrier_path, parts_iter, output_path):
+        """
+        copy รูปต้นฉบับ แล้วเขียน (Header, Data) จาก parts_iter ต่อท้ายผ่าน Buffer 1 MiB
+        ใช้คู่กับ fragment_payload_iter -> ไม่ต้องสร้าง Stream ที่ Fragment แล้วทั้งก้อน
+        """
+        try:
+            with open(carrier_path, 'rb') as f_img, \
+                    open(output_path, 'wb', buffering=Locomotive.COPY_BUFSIZE) as f_out:
+                copy_carrier(f_img, f_out)
+                for header, chunk in parts_iter:
+                    f_out.write(header)
+                    f_out.write(chunk)
+            return True, "Success"
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    def _find_png_end(mm):
+        """
+        หา offset หลัง IEND ตัวจริงของ PNG (จุดเริ่มข้อมูลที่ซ่อน) หรือ -1 ถ้าไม่เจอ
+        เดินตาม Chunk Header (Length + Type) แล้วกระโดดข้ามข้อมูลแต่ละ Chunk
+        -> อ่านแค่ไม่กี่ byte ต่อ Chunk แทนการสแกนทั้งรูป
+        (ไม่ใช้ rfind จากท้ายไฟล์ เพราะข้อมูลที่ซ่อนอาจมี IEND ของ PNG อื่นอยู่ข้างใน)
+        """
+        size = len(mm)
+        if mm[:8] == PNG_FILE_SIG:
+            pos = 8
+            while pos + 12 <= size:
+                length, chunk_type = CHUNK_HDR.unpack_from(mm, pos)
+                end = pos + 12 + length  # Length(4) + Type(4) + Data + CRC(4)
+                if chunk_type == b'IEND':
+                    if end <= size: return end
+                    break
+                pos = end
+        
+        # Fallback: ไฟล์ไม่ตรงโครงสร้าง -> สแกนหา Signature แบบเดิม
+        eof_index = mm.find(Locomotive.PNG_EOF_SIG)
+        if eof_index == -1:
+            return -1
+        return eof_index + len(Locomotive.PNG_EOF_SIG)
+
     @staticmethod
     def get_raw_payload_core(stego_image_path):
         try:
             with open(stego_image_path, 'rb') as f:
-                all_data = f.read()
-            
-            eof_index = all_data.find(Locomotive.PNG_EOF_SIG)
-            if eof_index == -1:
-                return None, "Not a valid PNG or damaged"
-            
-            split_point = eof_index + len(Locomotive.PNG_EOF_SIG)
-            
-            if split_point >= len(all_data):
-                return None, "No hidden data found"
-            
-            secret_data = all_data[split_point:]
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None, "Not a valid PNG or damaged"
+                
+                # ค้นหาบน mmap (page cache) แทนการอ่านทั้งไฟล์เข้า RAM
+                # copy ออกมาเฉพาะข้อมูลที่ซ่อนอยู่ท้ายไฟล์
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    split_point = Locomotive._find_png_end(mm)
+                    if split_point == -1:
+                        return None, "Not a valid PNG or damaged"
+                    
+                    if split_point >= len(mm):
+                        return None, "No hidden data found"
+                    
+                    secret_data = mm[split_point:]
             return secret_data, "Success"
         except Exception as e:
-            return None, str(e)
\ No newline at end of file
+            return None, str(e)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import functools
+
 import numpy as np
-from numba import njit
+from numba import njit, prange
 
-@njit(cache=True)
+@njit(cache=True, parallel=True, boundscheck=False)
 def _compute_entropy_jit(
     padded_gray: np.ndarray, 
     h: int, 
@@ -17,62 +19,80 @@ def _compute_entropy_jit(
     เพื่อรักษาความแม่นยำให้ตรงกับ NumPy ต้นฉบับ
     """
     entropy_map = np.zeros((h, w), dtype=np.float32)
+    area = window_size * window_size
     
-    # จอง Memory สำหรับ Histogram ครั้งเดียวแล้วใช้ซ้ำ (เร็วกว่าสร้างใหม่ทุกรอบ)
-    hist = np.zeros(256, dtype=np.int32)
-    
-    # วนลูปทุกพิกเซล (ส่วนที่เป็นคอขวดเดิม)
-    for i in range(h):
+    # แต่ละแถวไม่ขึ้นต่อกัน -> กระจายแถวให้หลาย Thread (prange)
+    # ไม่ใช้ fastmath เพราะจะสลับลำดับการบวก ent_sum ทำให้ค่าเพี้ยนจากเดิม
+    # (Pixel Order ต้องตรงกันทุกบิตระหว่างฝัง/ถอด)
+    for i in prange(h):
+        # Histogram ของแต่ละแถว (แต่ละ Thread มีของตัวเอง)
+        hist = np.zeros(256, dtype=np.int32)
+        # ค่าสีที่มีอยู่ในหน้าต่าง เรียงจากน้อยไปมาก (ไม่เกิน area ค่า)
+        # ใช้แทนการไล่ครบ 256 bin และยังบวกตามลำดับ bin เดิม (ผลลัพธ์ตรงทุกบิต)
+        present = np.empty(area, dtype=np.int32)
+        n_present = 0
+        
         for j in range(w):
-            # 1. Reset Histogram
-            hist[:] = 0
+            # 1-2. Rolling Histogram: หน้าต่างแรกนับเต็ม K*K
+            #      จากนั้นเลื่อนขวาทีละคอลัมน์ (ลบคอลัมน์ซ้าย + เพิ่มคอลัมน์ขวา = 2K ครั้ง)
+            if j == 0:
+                col_lo = 0
+                col_hi = window_size
+            else:
+                col_lo = j + window_size - 1
+                col_hi = j + window_size
+                for wy in range(window_size):
+                    val = padded_gray[i + wy, j - 1]
+                    hist[val] -= 1
+                    if hist[val] == 0:
+                        # เอาค่าที่หมดออกจาก present (เลื่อนตัวที่เหลือมาทางซ้าย)
+                        pos = 0
+                        while present[pos] != val:
+                            pos += 1
+                        for t in range(pos, n_present - 1):
+                            present[t] = present[t + 1]
+                        n_present -= 1
             
-            # 2. นับความถี่สีในหน้าต่าง (Window Scanning)
-            # padded index: i -> i+wy, j -> j+wx
             for wy in range(window_size):
-                for wx in range(window_size):
-                    val = padded_gray[i + wy, j + wx]
+                for wx in range(col_lo, col_hi):
+                    val = padded_gray[i + wy, wx]
                     hist[val] += 1
+                    if hist[val] == 1:
+                        # ค่าใหม่ -> แทรกลง present ให้ยังเรียงอยู่ (Insertion)
+                        pos = n_present
+                        while pos > 0 and present[pos - 1] > val:
+                            present[pos] = present[pos - 1]
+                            pos -= 1
+                        present[pos] = val
+                        n_present += 1
+            
+            # Fast-path: ทั้งหน้าต่างเป็นสีเดียว (พื้นที่เรียบ) -> Entropy = 0 พอดี
+            # (entropy_map เริ่มต้นเป็น 0 อยู่แล้ว ข้ามการรวมได้เลย)
+            if n_present == 1:
+                continue
             
             # 3. คำนวณ Entropy โดยใช้ Lookup Table
             # (ดึงค่าที่คำนวณไว้แล้วมาบวกกัน แทนการคำนวณใหม่)
             ent_sum = 0.0
-            for k in range(256):
-                count = hist[k]
-                if count > 0:
-                    ent_sum += entropy_lookup[count]
+            for t in range(n_present):
+                ent_sum += entropy_lookup[hist[present[t]]]
             
-            # 4. หาร 8.0 ตาม Logic เดิม
-            entropy_map[i, j] = ent_sum / 8.0
+            # 4. ตารางถูกหาร 8.0 (log2(256)) ไว้แล้ว -> Clamp [0, 1] ตอนเขียนเลย
+            #    (แทน np.clip ทั้งภาพหลังออกจาก Kernel)
+            if ent_sum > 1.0:
+                ent_sum = 1.0
+            elif ent_sum < 0.0:
+                ent_sum = 0.0
+            entropy_map[i, j] = ent_sum
 
     return entropy_map
 
 
-def compute_local_entropy(gray: np.ndarray, window_size: int = 5) -> np.ndarray:
+@functools.lru_cache(maxsize=8)
+def _entropy_lookup(window_size: int) -> np.ndarray:
     """
-    Compute local entropy for each pixel based on a sliding window.
-    
-    Optimization Strategy:
-    - Pre-calculate all possible entropy terms using NumPy (Lookup Table) to match precision.
-    - Use Numba JIT for high-speed iteration and histogram building.
+    ตารางเทอม -p*log2(p) / 8 สำหรับทุกค่าความถี่ที่เป็นไปได้ในหน้าต่าง (float32, อ่านอย่างเดียว)
     """
-    if gray.ndim != 2:
-        raise ValueError("gray must be 2D")
-
-    if window_size % 2 == 0 or window_size < 3:
-        raise ValueError("window_size must be odd and >= 3")
-
-    # 1. Prepare Padded Image (Logic เดิม)
-    gray_u8 = np.clip(gray, 0, 255).astype(np.uint8)
-    
-    pad = window_size // 2
-    padded = np.pad(gray_u8, pad_width=pad, mode="reflect")
-    
-    h, w = gray.shape
-
-    # -------------------------------------------------------------------------
-    # 2. สร้าง Lookup Table (หัวใจสำคัญของการแก้ปัญหา)
-    # -------------------------------------------------------------------------
     # ในหน้าต่างขนาดคงที่ (เช่น 5x5=25) ค่าความถี่ (Count) ของแต่ละสี
     # จะมีค่าได้ตั้งแต่ 0 ถึง 25 เท่านั้น เราจึงคำนวณค่าเทอมของ Entropy ไว้ก่อนได้เลย
     
@@ -93,10 +113,69 @@ def compute_local_entropy(gray: np.ndarray, window_size: int = 5) -> np.ndarray:
     # สูตร: - (p * log2(p))
     lookup_table[valid_mask] = - (p[valid_mask] * np.log2(p[valid_mask]))
     
+    # หาร 8.0 (Entropy สูงสุดของ 8-bit) ไว้ในตารางเลย แทนการหารทุกพิกเซลใน Kernel
+    # 8 เป็นกำลังของ 2 -> ผลหารและผลรวมตรงกับการหารทีหลังทุกบิต
+    lookup_table /= 8.0
+    
+    # ใช้ร่วมกันทุกครั้งที่เรียก -> ห้ามแก้ไข
+    lookup_table.setflags(write=False)
+    return lookup_table
+
+
+def _pad_reflect_u8(gray: np.ndarray, pad: int) -> np.ndarray:
+    """
+    เท่ากับ np.pad(np.clip(gray, 0, 255).astype(np.uint8), pad, mode="reflect")
+    แต่ clip + cast เขียนลงกลางบัฟเฟอร์ปลายทางโดยตรง แล้วสะท้อนขอบในที่เดิม
+    (ไม่ต้องมีภาพ uint8 ชั่วคราวอีกก้อน)
+    """
+    h, w = gray.shape
+    if h <= pad or w <= pad:
+        # ภาพเล็กกว่าขอบ -> ต้องสะท้อนซ้ำหลายรอบ ให้ np.pad จัดการ
+        gray_u8 = gray if gray.dtype == np.uint8 else np.clip(gray, 0, 255).astype(np.uint8)
+        return np.pad(gray_u8, pad_width=pad, mode="reflect")
+
+    padded = np.empty((h + 2 * pad, w + 2 * pad), dtype=np.uint8)
+    center = padded[pad:pad + h, pad:pad + w]
+    if gray.dtype == np.uint8:
+        center[...] = gray  # อยู่ในช่วง 0..255 อยู่แล้ว ไม่ต้อง clip
+    else:
+        np.clip(gray, 0, 255, out=center, casting="unsafe")
+
+    # reflect (ไม่ซ้ำขอบ) แบบเดียวกับ np.pad: แกนแถวก่อน แล้วค่อยแกนคอลัมน์ (รวมมุม)
+    for k in range(1, pad + 1):
+        padded[pad - k, pad:pad + w] = padded[pad + k, pad:pad + w]
+        padded[pad + h - 1 + k, pad:pad + w] = padded[pad + h - 1 - k, pad:pad + w]
+    for k in range(1, pad + 1):
+        padded[:, pad - k] = padded[:, pad + k]
+        padded[:, pad + w - 1 + k] = padded[:, pad + w - 1 - k]
+    return padded
+
+
+def compute_local_entropy(gray: np.ndarray, window_size: int = 5) -> np.ndarray:
+    """
+    Compute local entropy for each pixel based on a sliding window.
+    
+    Optimization Strategy:
+    - Pre-calculate all possible entropy terms using NumPy (Lookup Table) to match precision.
+    - Use Numba JIT for high-speed iteration and histogram building.
+    """
+    if gray.ndim != 2:
+        raise ValueError("gray must be 2D")
+
+    if window_size % 2 == 0 or window_size < 3:
+        raise ValueError("window_size must be odd and >= 3")
+
+    # 1. Prepare Padded Image (Logic เดิม: clip -> uint8 -> reflect pad)
+    pad = window_size // 2
+    padded = _pad_reflect_u8(gray, pad)
+    
+    h, w = gray.shape
+
+    # 2. Lookup Table (สร้างครั้งเดียวต่อ window_size แล้ว cache ไว้)
+    lookup_table = _entropy_lookup(window_size)
+    
     # -------------------------------------------------------------------------
     # 3. ส่งเข้า JIT Kernel
     # -------------------------------------------------------------------------
-    entropy_map = _compute_entropy_jit(padded, h, w, window_size, lookup_table)
-    
-    # 4. Clamp Result (Logic เดิม)
-    return np.clip(entropy_map, 0.0, 1.0)
\ No newline at end of file
+    # (Kernel clamp ค่าให้อยู่ใน [0, 1] ให้แล้ว)
+    return _compute_entropy_jit(padded, h, w, window_size, lookup_table)
\ No newline at end of file
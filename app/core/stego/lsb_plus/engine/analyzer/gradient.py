@@ -1,62 +1,174 @@
 from __future__ import annotations
 import numpy as np
-from numba import njit
+from numba import njit, prange
 
-@njit(cache=True)
-def _sobel_reflect_jit(gray: np.ndarray) -> np.ndarray:
+# จำนวนแถวต่อแถบ (Band) ที่แต่ละ Thread รับไปทำ
+_SOBEL_BAND_ROWS = 64
+
+# True = ใช้ |Gx| + |Gy| (L1) แทน sqrt(Gx^2 + Gy^2) -> เร็วกว่า (ไม่มี sqrt)
+# ค่าเริ่มต้นต้องเป็น False: Gradient มีผลต่อ Capacity Map ถ้าเปลี่ยน
+# ภาพที่ฝังด้วยเวอร์ชันก่อนจะถอดไม่ได้ (ต้องตั้งค่าเดียวกันทั้งตอนฝังและถอด)
+USE_L1_MAGNITUDE = False
+
+@njit(cache=True, parallel=True, boundscheck=False)
+def _sobel_reflect_jit(gray: np.ndarray, use_l1: bool = False) -> np.ndarray:
     """
-    คำนวณ Sobel Magnitude แบบ Single-pass
+    คำนวณ Sobel Magnitude แบบ Separable (2 pass)
+    Sobel = [1,2,1] x [-1,0,1] -> ทำแนวนอนก่อน แล้วค่อยรวมแนวตั้ง
+    (ใช้ผลรวมบางส่วนของแต่ละแถวซ้ำ 3 ครั้ง แทนการดึง 3x3 ใหม่ทุกพิกเซล)
     """
     rows, cols = gray.shape
     magnitude = np.zeros((rows, cols), dtype=np.float32)
 
-    for y in range(rows):
-        for x in range(cols):
-            # --- Logic การสะท้อนขอบ ---
-            # ถ้า index หลุดขอบซ้าย (-1) ให้ใช้ขอบซ้าย (0) แทน
-            # ถ้า index หลุดขอบขวา (cols) ให้ใช้ขอบขวา (cols-1) แทน
-            
-            x_L = max(x - 1, 0)         # Left index
-            x_R = min(x + 1, cols - 1)  # Right index
+    # แบ่งภาพเป็นแถบแนวนอน กระจายให้หลาย Thread (prange)
+    # แต่ละแถบมี Ring Buffer ของตัวเอง (คำนวณแถวขอบแถบซ้ำ 1-2 แถว)
+    n_bands = (rows + _SOBEL_BAND_ROWS - 1) // _SOBEL_BAND_ROWS
+    for band in prange(n_bands):
+        y_start = band * _SOBEL_BAND_ROWS
+        y_end = min(y_start + _SOBEL_BAND_ROWS, rows)
+
+        # Scratch เป็น float64: ผลรวมของค่า gray (float32) ไม่กี่ตัวใน float64 เป็นค่าแม่นตรง
+        # -> ลำดับการบวกไม่มีผล ได้ Gx/Gy ตรงกับสูตร 3x3 เดิมทุกบิต
+        # เก็บแค่ 3 แถวล่าสุดแบบวนรอบ (Ring Buffer) ให้อยู่ใน Cache
+        row_smooth = np.empty((3, cols), dtype=np.float64)  # g[x-1] + 2g[x] + g[x+1]
+        row_diff = np.empty((3, cols), dtype=np.float64)    # g[x+1] - g[x-1]
+        done_rows = max(y_start - 1, 0)  # แถวถัดไปที่ยังไม่ผ่าน Pass แนวนอน
+
+        for y in range(y_start, y_end):
             y_T = max(y - 1, 0)         # Top index
             y_B = min(y + 1, rows - 1)  # Bottom index
 
-            # 1. ดึงค่าจากตาราง 3x3 รอบจุด (y, x) โดยใช้พิกัดที่ปลอดภัย
-            val_TL = gray[y_T, x_L]; val_T = gray[y_T, x]; val_TR = gray[y_T, x_R]
-            val_L  = gray[y,   x_L];                       val_R  = gray[y,   x_R]
-            val_BL = gray[y_B, x_L]; val_B = gray[y_B, x]; val_BR = gray[y_B, x_R]
+            # --- Pass 1: แนวนอน (ทำแถวใหม่ที่ต้องใช้ ไม่เกิน 1-2 แถวต่อรอบ) ---
+            while done_rows <= y_B:
+                r = done_rows
+                slot = r % 3
+                for x in range(cols):
+                    # --- Logic การสะท้อนขอบ ---
+                    # ถ้า index หลุดขอบซ้าย (-1) ให้ใช้ขอบซ้าย (0) แทน
+                    # ถ้า index หลุดขอบขวา (cols) ให้ใช้ขอบขวา (cols-1) แทน
+                    x_L = max(x - 1, 0)         # Left index
+                    x_R = min(x + 1, cols - 1)  # Right index
+
+                    val_L = np.float64(gray[r, x_L])
+                    val_C = np.float64(gray[r, x])
+                    val_R = np.float64(gray[r, x_R])
 
-            # 2. คำนวณ Gx (แนวนอน)
-            # Kernel: [-1, 0, 1]
-            gx = (val_TR + 2*val_R + val_BR) - (val_TL + 2*val_L + val_BL)
+                    row_smooth[slot, x] = val_L + 2.0 * val_C + val_R
+                    row_diff[slot, x] = val_R - val_L
+                done_rows += 1
 
-            # 3. คำนวณ Gy (แนวตั้ง)
-            # Kernel: [-1, -2, -1] (Transpose)
-            gy = (val_BL + 2*val_B + val_BR) - (val_TL + 2*val_T + val_TR)
+            # --- Pass 2: แนวตั้ง ---
+            s_T = y_T % 3
+            s_C = y % 3
+            s_B = y_B % 3
+            for x in range(cols):
+                # Gx (แนวนอน): [1,2,1]^T * [-1, 0, 1]
+                gx = row_diff[s_T, x] + 2.0 * row_diff[s_C, x] + row_diff[s_B, x]
 
-            # 4. รวมร่าง Magnitude (Hypot)
-            magnitude[y, x] = np.sqrt(gx**2 + gy**2)
+                # Gy (แนวตั้ง): [-1, 0, 1]^T * [1, 2, 1]
+                gy = row_smooth[s_B, x] - row_smooth[s_T, x]
+
+                # รวมร่าง Magnitude (Hypot หรือ L1)
+                if use_l1:
+                    magnitude[y, x] = abs(gx) + abs(gy)
+                else:
+                    magnitude[y, x] = np.sqrt(gx**2 + gy**2)
 
     return magnitude
 
-def compute_normalized_sobel(gray: np.ndarray) -> np.ndarray:
+@njit(cache=True, parallel=True, boundscheck=False)
+def _gray_sobel_from_rgb_jit(rgb: np.ndarray, gray_out: np.ndarray, use_l1: bool = False) -> np.ndarray:
     """
-    Compute Sobel gradient magnitude and normalize to [0, 1].
-    Optimized version with Numba (maintains 'reflect' border behavior).
+    รวม 2 ขั้นตอนไว้ใน Kernel เดียว:
+    1. Grayscale (BT.601 หลังเคลียร์ LSB) -> เขียนลง gray_out
+    2. Sobel Magnitude แบบ Separable จากค่า gray ที่เพิ่งคำนวณ (ไม่ต้องอ่าน gray กลับจาก Memory)
     """
-    if gray.ndim != 2:
-        raise ValueError("gray must be 2D")
+    rows, cols = gray_out.shape
+    magnitude = np.zeros((rows, cols), dtype=np.float32)
 
-    # 1. เรียกใช้ JIT Function (เร็ว + ประหยัดแรม)
-    mag = _sobel_reflect_jit(gray)
+    n_bands = (rows + _SOBEL_BAND_ROWS - 1) // _SOBEL_BAND_ROWS
+    for band in prange(n_bands):
+        y_start = band * _SOBEL_BAND_ROWS
+        y_end = min(y_start + _SOBEL_BAND_ROWS, rows)
 
-    # 2. Normalize
+        row_smooth = np.empty((3, cols), dtype=np.float64)
+        row_diff = np.empty((3, cols), dtype=np.float64)
+        row_gray = np.empty(cols, dtype=np.float64)
+        done_rows = max(y_start - 1, 0)
+
+        for y in range(y_start, y_end):
+            y_T = max(y - 1, 0)
+            y_B = min(y + 1, rows - 1)
+
+            # --- Pass 1: Gray ของแถวใหม่ + แนวนอน ---
+            while done_rows <= y_B:
+                r = done_rows
+                slot = r % 3
+                for x in range(cols):
+                    # ปัดเป็น float32 ก่อน ให้ได้ค่าเดียวกับ gray ที่เก็บไว้ทุกบิต
+                    gv = np.float32(0.299 * (rgb[r, x, 0] & 0xFE)
+                                    + 0.587 * (rgb[r, x, 1] & 0xFE)
+                                    + 0.114 * (rgb[r, x, 2] & 0xFE))
+                    row_gray[x] = gv
+                    # แถวขอบแถบจะถูกคำนวณซ้ำโดยแถบข้างเคียง -> เขียนเฉพาะแถวของตัวเอง
+                    if y_start <= r < y_end:
+                        gray_out[r, x] = gv
+                for x in range(cols):
+                    x_L = max(x - 1, 0)
+                    x_R = min(x + 1, cols - 1)
+                    row_smooth[slot, x] = row_gray[x_L] + 2.0 * row_gray[x] + row_gray[x_R]
+                    row_diff[slot, x] = row_gray[x_R] - row_gray[x_L]
+                done_rows += 1
+
+            # --- Pass 2: แนวตั้ง ---
+            s_T = y_T % 3
+            s_C = y % 3
+            s_B = y_B % 3
+            for x in range(cols):
+                gx = row_diff[s_T, x] + 2.0 * row_diff[s_C, x] + row_diff[s_B, x]
+                gy = row_smooth[s_B, x] - row_smooth[s_T, x]
+                if use_l1:
+                    magnitude[y, x] = abs(gx) + abs(gy)
+                else:
+                    magnitude[y, x] = np.sqrt(gx**2 + gy**2)
+
+    return magnitude
+
+def _normalize_magnitude(mag: np.ndarray) -> np.ndarray:
+    """Min-max normalize Sobel magnitude -> [0, 1] (float32, in-place on mag)"""
     mag_min = float(mag.min())
     mag_max = float(mag.max())
     denom = (mag_max - mag_min)
     if denom == 0:
         denom = 1.0
         
-    grad_norm = (mag - mag_min) / denom
+    # [Optimize] mag เป็น Buffer ชั่วคราวของเราเอง -> แก้ในที่ ไม่สร้าง Array ใหม่
+    # ใช้การหาร (ไม่ใช่คูณด้วย 1/denom) ให้ปัดเศษตรงกับสูตรเดิมทุกบิต
+    np.subtract(mag, mag_min, out=mag)
+    np.divide(mag, denom, out=mag)
     
-    return grad_norm.astype(np.float32)
\ No newline at end of file
+    return mag
+
+def compute_gray_and_sobel(rgb: np.ndarray):
+    """
+    Compute LSB-cleared BT.601 grayscale and its normalized Sobel magnitude
+    in one fused pass. Returns (gray, grad_norm).
+    """
+    rows, cols = rgb.shape[:2]
+    gray = np.empty((rows, cols), dtype=np.float32)
+    mag = _gray_sobel_from_rgb_jit(rgb, gray, USE_L1_MAGNITUDE)
+    return gray, _normalize_magnitude(mag)
+
+def compute_normalized_sobel(gray: np.ndarray) -> np.ndarray:
+    """
+    Compute Sobel gradient magnitude and normalize to [0, 1].
+    Optimized version with Numba (maintains 'reflect' border behavior).
+    """
+    if gray.ndim != 2:
+        raise ValueError("gray must be 2D")
+
+    # 1. เรียกใช้ JIT Function (เร็ว + ประหยัดแรม)
+    mag = _sobel_reflect_jit(gray, USE_L1_MAGNITUDE)
+
+    # 2. Normalize
+    return _normalize_magnitude(mag)
\ No newline at end of file
@@ -1,35 +1,12 @@
 from __future__ import annotations
 import numpy as np
-from numba import njit
 
-from .gradient import compute_normalized_sobel
+from .gradient import compute_gray_and_sobel
 from .entropy import compute_local_entropy
 
-@njit(cache=True)
-def _preprocess_image(rgb: np.ndarray) -> np.ndarray:
-    """
-    ฟังก์ชันช่วย (Helper): ทำงานแบบ Single-pass
-    1. Zero-out LSB (rgb & 0xFE)
-    2. คำนวณ Grayscale (BT.601)
-    """
-    rows, cols, channels = rgb.shape
-    gray = np.zeros((rows, cols), dtype=np.float32)
-
-    for row in range(rows):
-        for col in range(cols):
-            # 1. ดึงค่าสีและเคลียร์ LSB ทันที
-            r = rgb[row, col, 0] & 0xFE
-            g = rgb[row, col, 1] & 0xFE
-            b = rgb[row, col, 2] & 0xFE
-            
-            # 2.แปลงเป็นภาพขาวดำ (Grayscale Conversion)
-            # ใช้สูตรมาตรฐาน ITU-R BT.601 (Luma Transform) ในการคำนวณความสว่าง
-            # สูตรนี้ถ่วงน้ำหนักตาม Human Eye Sensitivity
-            # - สีเขียว (59%): ตาไวต่อแสงนี้มากที่สุด จึงมีผลต่อความสว่างมากที่สุด
-            # - สีแดง (30%) และ สีน้ำเงิน (11%): มีผลรองลงมา
-            gray[row, col] = 0.299 * r + 0.587 * g + 0.114 * b
-            
-    return gray
+# จำนวนแถวต่อ Tile สำหรับขั้น Entropy + Surface (ให้ข้อมูลต่อ Tile อยู่ใน L2)
+_TEXTURE_TILE_ROWS = 256
+_ENTROPY_WINDOW = 5
 
 # -------------------------------------------------------------------------
 # ฟังก์ชันหลัก
@@ -44,18 +21,34 @@ def compute_texture_features(rgb: np.ndarray):
     if rgb.ndim != 3 or rgb.shape[2] != 3:
         raise ValueError("rgb must be Height * Width * 3 array")
 
-    # 2. Preprocessing (Optimized):
-    gray = _preprocess_image(rgb)
-
-    # 3. Feature Extraction: คำนวณขอบ (Gradient) และความยุ่งเหยิง (Entropy)
-    grad_norm = compute_normalized_sobel(gray)
-    entropy_norm = compute_local_entropy(gray, window_size=5)
-
-    # 4. Score Calculation: รวมคะแนน
-    # ให้ความสำคัญกับขอบภาพ (0.6) มากกว่า Noise (0.4)
-    surface = 0.6 * grad_norm + 0.4 * entropy_norm
-    
-    # Clip ค่าให้อยู่ในช่วง 0.0 - 1.0 เสมอ
-    surface = np.clip(surface, 0.0, 1.0)
-
-    return gray, grad_norm, entropy_norm, surface
\ No newline at end of file
+    # 2-3. Preprocessing + Gradient ใน Kernel เดียว (Gray ถูกใช้ต่อทันทีขณะอยู่ใน Cache)
+    gray, grad_norm = compute_gray_and_sobel(rgb)
+
+    # 3-4. Entropy + Surface ทีละ Tile แนวนอน
+    # [Optimize] Tile ซ้อนกัน pad แถว (ครึ่งหน้าต่าง) ค่าที่ได้จึงเหมือนคำนวณทั้งภาพเป๊ะ
+    # และรวม Surface ทันทีขณะ Tile ยังอยู่ใน Cache (ไม่สร้าง Array ชั่วคราวขนาดเต็มภาพ)
+    rows = gray.shape[0]
+    pad = _ENTROPY_WINDOW // 2
+    entropy_norm = np.empty_like(gray)
+    surface = np.empty_like(grad_norm)
+
+    for y0 in range(0, rows, _TEXTURE_TILE_ROWS):
+        y1 = min(rows, y0 + _TEXTURE_TILE_ROWS)
+        top = max(0, y0 - pad)
+        bottom = min(rows, y1 + pad)
+
+        # 3. Feature Extraction: ความยุ่งเหยิง (Entropy)
+        tile = compute_local_entropy(gray[top:bottom], window_size=_ENTROPY_WINDOW)
+        ent = entropy_norm[y0:y1]
+        ent[...] = tile[y0 - top:y1 - top]
+
+        # 4. Score Calculation: รวมคะแนน
+        # ให้ความสำคัญกับขอบภาพ (0.6) มากกว่า Noise (0.4)
+        surf = surface[y0:y1]
+        np.multiply(grad_norm[y0:y1], 0.6, out=surf)
+        surf += 0.4 * ent
+
+        # Clip ค่าให้อยู่ในช่วง 0.0 - 1.0 เสมอ
+        np.clip(surf, 0.0, 1.0, out=surf)
+
+    return gray, grad_norm, entropy_norm, surface
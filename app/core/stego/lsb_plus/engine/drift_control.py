@@ -3,7 +3,7 @@ from dataclasses import dataclass
 import numpy as np
 from numba import njit
 
-from app.core.stego.lsb_plus.engine.util.metrics import _calc_hist_stats_jit, _to_gray_jit
+from app.core.stego.lsb_plus.engine.util.metrics import _gray_hist_jit, _hist_stats_jit, _to_gray_jit
 
 # Import ฟังก์ชัน JIT จาก metrics.py (สมมติว่าอยู่ในระดับเดียวกันหรือแก้ path ตามจริง)
 
@@ -48,8 +48,12 @@ def _is_block_safe_jit(
     go_u8 = go.astype(np.uint8)
     gs_u8 = gs.astype(np.uint8)
     
-    # คำนวณ HD และ CS ในรอบเดียว (Single-pass)
-    hd, cs = _calc_hist_stats_jit(go_u8, gs_u8, density=True)
+    # นับ Histogram ครั้งเดียว ใช้ซ้ำทั้ง HD และ CS
+    ho = _gray_hist_jit(go_u8)
+    hs = _gray_hist_jit(gs_u8)
+    size = go_u8.size
+    
+    hd, cs = _hist_stats_jit(ho, hs, size, density=True)
     
     # เช็คเงื่อนไขที่เหลือ
     if hd > max_hd:
@@ -58,7 +62,7 @@ def _is_block_safe_jit(
     # สำหรับ Chi-Square ในโหมด density=True ค่าจะถูก scale 
     # เราจะคำนวณแบบดิบ (Raw) อีกครั้งถ้าจำเป็น หรือปรับจูนที่ตัวเลข CS
     # ในที่นี้เพื่อให้ตรง 100% เราจะเรียกแบบ density=False สำหรับ CS
-    _, cs_raw = _calc_hist_stats_jit(go_u8, gs_u8, density=False)
+    _, cs_raw = _hist_stats_jit(ho, hs, size, density=False)
     
     if cs_raw > max_cs:
         return False
@@ -1,15 +1,66 @@
 from __future__ import annotations
 from typing import List, Union, Any
 import numpy as np
-from numba import njit
+from numba import config as numba_config, njit, prange
 # ตัด tqdm ออกเพื่อให้ทำงานแบบ Silent/Fastest หรือจะใส่กลับมาก็ได้ถ้าต้องการ Progress Bar
 # แต่ใน LSBPP เรามี callback update แยกต่างหากที่ชั้นบนอยู่แล้ว
 
-@njit(cache=True)
+@njit(cache=True, inline='always')
 def _bitwise_lsb(val: int, bit: int) -> int:
-    """คำนวณค่า LSB: เปลี่ยนบิตสุดท้ายของ val ให้เป็น bit"""
+    """คำนวณค่า LSB: เปลี่ยนบิตสุดท้ายของ val ให้เป็น bit (Inline เข้า Loop JIT)"""
     return (val & 0xFE) | (bit & 0x01)
 
+@njit(cache=True, boundscheck=False)
+def _embed_loop_jit(flat, order, capacity_flat, bits_arr):
+    """
+    Main Loop (Machine Code): วนตาม Pixel Order แล้วฝังบิตลง LSB
+    คืนค่า (bit_pos, n_pixels): จำนวนบิตที่ฝังได้จริง และจำนวนพิกเซลแรกของ order ที่ถูกใช้
+    """
+    channels = np.array((2, 1, 0), dtype=np.int8)  # ลำดับการฝัง: Blue -> Green -> Red
+    total_bits = bits_arr.size
+    bit_pos = 0
+    n_pixels = 0
+
+    for i in range(order.size):
+        # เงื่อนไขหยุด: ฝังข้อมูลครบทุกบิตแล้ว
+        if bit_pos >= total_bits:
+            break
+
+        flat_idx = order[i]
+        # ใช้ความจุจาก Map โดยตรง (Pre-calculated) -> ตรงกับ Extractor เป๊ะๆ
+        cap = int(capacity_flat[flat_idx])
+
+        for k in range(3):
+            # หยุดถ้าข้อมูลหมด หรือความจุของพิกเซลนี้หมด
+            if bit_pos >= total_bits or cap <= 0:
+                break
+            ch = channels[k]
+            flat[flat_idx, ch] = _bitwise_lsb(flat[flat_idx, ch], bits_arr[bit_pos])
+            bit_pos += 1
+            cap -= 1
+            n_pixels = i + 1
+
+    return bit_pos, n_pixels
+
+@njit(cache=True, parallel=True, boundscheck=False)
+def _embed_loop_parallel_jit(flat, order, caps, starts, bits_arr, n_pixels):
+    """
+    Parallel Loop: แต่ละพิกเซลรู้ช่วงบิตของตัวเองจาก Prefix-sum (starts)
+    จึงเขียนได้อิสระต่อกัน ไม่มีการพึ่ง bit_pos ข้ามพิกเซล
+    """
+    channels = np.array((2, 1, 0), dtype=np.int8)  # ลำดับการฝัง: Blue -> Green -> Red
+    total_bits = bits_arr.size
+
+    for i in prange(n_pixels):
+        bit_start = starts[i]
+        # สูงสุด 3 บิตต่อพิกเซล (B, G, R) เหมือน Loop แบบ Serial -> ไม่อ่าน channels เกินขอบ
+        bit_end = min(bit_start + min(caps[i], 3), total_bits)
+        flat_idx = order[i]
+
+        for b in range(bit_start, bit_end):
+            ch = channels[b - bit_start]
+            flat[flat_idx, ch] = _bitwise_lsb(flat[flat_idx, ch], bits_arr[b])
+
 def embed_bits_low_level(
     rgb: np.ndarray,
     order: np.ndarray,
@@ -21,7 +72,9 @@ def embed_bits_low_level(
     gray_for_coords: Any,       # Unused in optimized version (legacy compatible)
     adjust_capacity_fn: Any,    # Unused: ตัดออกเพื่อให้ Sync กับ Extractor
     block_safety_checker: Any,  # Unused: ตัด Rollback ทิ้งเพื่อรักษา Data Integrity
-) -> np.ndarray:
+    *,
+    return_positions: bool = False,
+):
     """
     Optimized Low-Level Embedding Function
     
@@ -31,60 +84,38 @@ def embed_bits_low_level(
     2. DATA INTEGRITY: ตัดระบบ Rollback ทิ้ง เพื่อรับประกันว่าบิตถูกเขียนลงไปจริงๆ
        (ป้องกันข้อมูลแหว่งหายกลางทาง)
     3. SPEED UP: ตัด Dictionary Overhead และ Vectorize การทำงาน
+       (Loop รายพิกเซลถูก Compile ด้วย Numba และกระจายหลาย Core ผ่าน prange)
+
+    return_positions=True -> คืนค่า (rgb, positions) โดย positions คือ Flat Index
+    ของพิกเซลที่ถูกฝัง (View ของ order ไม่จองหน่วยความจำเพิ่ม) ใช้คิด PSNR เฉพาะจุดที่แก้
     """
 
     # 1. เตรียมข้อมูล
-    h, w, _ = rgb.shape
     # ใช้ View 1D เพื่อความเร็ว (Zero-copy) และแก้ไขค่าใน rgb ต้นฉบับได้เลย
     flat = rgb.reshape(-1, 3)
 
     # แปลง bits เป็น numpy array เพื่อการเข้าถึงที่รวดเร็ว
     bits_arr = np.asarray(bits, dtype=np.uint8)
     total_bits = int(bits_arr.size)
-    bit_pos = 0
+    if total_bits == 0:
+        return (rgb, order[:0]) if return_positions else rgb
 
-    channels = (2, 1, 0)  # ลำดับการฝัง: Blue -> Green -> Red
-    
-    # จำนวนพิกเซลทั้งหมดที่จะวิ่งผ่าน
-    num_pixels = order.size
+    if numba_config.NUMBA_NUM_THREADS <= 1:
+        # เครื่อง Core เดียว: Loop ตรงๆ เร็วกว่า (ไม่ต้องเสียเวลาทำ Prefix-sum)
+        bit_pos, n_pixels = _embed_loop_jit(flat, order, capacity_flat, bits_arr)
+    else:
+        # 2. Prefix-sum ของความจุตาม Pixel Order -> ช่วงบิตของแต่ละพิกเซล
+        # [CRITICAL FIX] ใช้ความจุจาก Map โดยตรง (Pre-calculated) ให้ตรงกับ Extractor เป๊ะๆ
+        # ความจุเกิน 3 ถูกตัดเหลือ 3 เหมือน Loop แบบ Serial (ฝังได้แค่ 3 Channel)
+        caps = np.minimum(capacity_flat[order], 3).astype(np.int64)
+        ends = np.cumsum(caps)
+        starts = ends - caps
+        bit_pos = min(int(ends[-1]), total_bits) if ends.size else 0
 
-    # 2. Main Loop: วนลูปตามลำดับ Pixel Order
-    for i in range(num_pixels):
-        # เงื่อนไขหยุด: ฝังข้อมูลครบทุกบิตแล้ว
-        if bit_pos >= total_bits:
-            break
+        # 3. Main Loop (JIT, Multi-core): ใช้เฉพาะพิกเซลที่ต้องฝังจริง
+        n_pixels = int(np.searchsorted(ends, bit_pos)) + 1 if bit_pos > 0 else 0
+        _embed_loop_parallel_jit(flat, order, caps, starts, bits_arr, n_pixels)
 
-        flat_idx = int(order[i])
-        
-        # [CRITICAL FIX] ใช้ความจุจาก Map โดยตรง (Pre-calculated)
-        # เดิม: cap = adjust_capacity_fn(...) -> ทำให้ค่าไม่ตรงกับตอนถอดรหัส
-        # ใหม่: cap = capacity_flat[...] -> ตรงกับ Extractor เป๊ะๆ
-        cap = int(capacity_flat[flat_idx])
-        
-        # ข้ามพิกเซลที่ไม่มีความจุ (ตามที่วิเคราะห์มาแล้ว)
-        if cap <= 0:
-            continue
-            
-        current_val_ref = flat[flat_idx]
-
-        # 3. ฝังข้อมูลลงแต่ละ Channel (B, G, R)
-        for ch in channels:
-            # หยุดถ้าข้อมูลหมด หรือความจุของพิกเซลนี้หมด
-            if bit_pos >= total_bits or cap <= 0:
-                break
-
-            orig_v = int(current_val_ref[ch])
-            bit_to_embed = int(bits_arr[bit_pos])
-            
-            # คำนวณและอัปเดตค่าสี
-            new_v = _bitwise_lsb(orig_v, bit_to_embed)
-
-            if new_v != orig_v:
-                flat[flat_idx, ch] = new_v
-
-            bit_pos += 1
-            cap -= 1
-            
     # 4. Final Verification (ตรวจสอบความสมบูรณ์)
     if bit_pos < total_bits:
         missing = total_bits - bit_pos
@@ -94,6 +125,8 @@ def embed_bits_low_level(
             f"Missing {missing} bits. (Embedded: {bit_pos}/{total_bits})"
         )
 
+    if return_positions:
+        return rgb, order[:n_pixels]
     return rgb
 
 @njit(cache=False) 
@@ -1,28 +1,21 @@
 from __future__ import annotations
 
-from typing import Iterable, List, Sequence
+from typing import Iterable, Sequence, Union
 
+import numpy as np
 
-def bytes_to_bits(data: bytes) -> List[int]:
-    bits: List[int] = []
-    for b in data:
-        for i in range(8):
-            bits.append((b >> (7 - i)) & 1)
-    return bits
 
+def bytes_to_bits(data: bytes) -> np.ndarray:
+    # MSB ก่อน (big bit-order) เหมือนเดิม -> uint8 array ของ 0/1
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
 
-def bits_to_bytes(bits: Sequence[int]) -> bytes:
-    if not bits:
+
+def bits_to_bytes(bits: Union[Sequence[int], np.ndarray]) -> bytes:
+    if len(bits) == 0:
         return b""
     length = len(bits) // 8 * 8
-    bits = bits[:length]
-    out = bytearray()
-    for i in range(0, length, 8):
-        byte = 0
-        for j in range(8):
-            byte = (byte << 1) | (bits[i + j] & 1)
-        out.append(byte)
-    return bytes(out)
+    arr = np.asarray(bits[:length], dtype=np.uint8) & 1
+    return np.packbits(arr).tobytes()
 
 
 def pack_bitstream(chunks: Iterable[bytes]) -> bytes:
@@ -1,7 +1,24 @@
 from __future__ import annotations
 import numpy as np
-from numba import njit
-from scipy import ndimage
+from numba import njit, prange
+
+# =============================================================================
+# 0. SSIM CONSTANTS (สร้างครั้งเดียวตอน Import ไม่ต้องสร้างใหม่ทุกครั้งที่เรียก)
+# =============================================================================
+
+_SSIM_C1 = 6.5025   # (0.01 * 255)^2
+_SSIM_C2 = 58.5225  # (0.03 * 255)^2
+
+def _gaussian_kernel_1d(win_size: int = 11, sigma: float = 1.5) -> np.ndarray:
+    """1D Gaussian Kernel (float32) สำหรับ Separable Convolution"""
+    ax = np.arange(-win_size // 2 + 1., win_size // 2 + 1.)
+    gauss = np.exp(-0.5 * np.square(ax) / np.square(sigma))
+    gauss /= np.sum(gauss)
+    kernel = gauss.astype(np.float32)
+    kernel.setflags(write=False)
+    return kernel
+
+_SSIM_KERNEL = _gaussian_kernel_1d(11, 1.5)
 
 # =============================================================================
 # 1. JIT HELPERS (ทำงานระดับ Machine Code เพื่อความเร็วสูงสุด)
@@ -19,25 +36,87 @@ def _to_gray_jit(img: np.ndarray) -> np.ndarray:
             gray[y, x] = 0.299 * img[y, x, 0] + 0.587 * img[y, x, 1] + 0.114 * img[y, x, 2]
     return gray
 
+@njit(cache=True, parallel=True)
+def _to_gray_par_jit(img: np.ndarray) -> np.ndarray:
+    """
+    แปลง RGB เป็น Gray (Float32) สำหรับภาพเต็ม: กระจายแถวให้หลาย Thread (prange)
+    ค่าเท่ากับ _to_gray_jit ทุกบิต (Block เล็กๆ ยังใช้ตัว Serial เพื่อเลี่ยง Overhead ของ Thread)
+    """
+    if img.ndim == 2:
+        return img.astype(np.float32)
+    h, w = img.shape[:2]
+    gray = np.empty((h, w), dtype=np.float32)
+    for y in prange(h):
+        for x in range(w):
+            gray[y, x] = 0.299 * img[y, x, 0] + 0.587 * img[y, x, 1] + 0.114 * img[y, x, 2]
+    return gray
+
 @njit(cache=True)
-def _calc_hist_stats_jit(o_gray, s_gray, density=False):
-    """คำนวณ Histogram Stats (Drift & Chi-Square)"""
-    # ใช้ Array เล็กๆ เก็บ bin เพื่อความเร็ว
-    ho = np.zeros(256, dtype=np.float64)
-    hs = np.zeros(256, dtype=np.float64)
-    
-    fo = o_gray.ravel()
-    fs = s_gray.ravel()
-    size = fo.size
+def _to_gray_u8_jit(img: np.ndarray) -> np.ndarray:
+    """
+    แปลง RGB เป็น Gray (uint8) ใน Pass เดียว สำหรับ Histogram
+    ค่าเท่ากับ _to_gray_jit(img).astype(np.uint8) (ปัดเป็น float32 ก่อนแล้วตัดทศนิยม)
+    แต่ไม่ต้องสร้าง Array float32 ขนาดเต็มภาพคั่นกลาง
+    """
+    if img.ndim == 2:
+        return img.astype(np.float32).astype(np.uint8)
+    h, w = img.shape[:2]
+    gray = np.empty((h, w), dtype=np.uint8)
+    for y in range(h):
+        for x in range(w):
+            g = np.float32(0.299 * img[y, x, 0] + 0.587 * img[y, x, 1] + 0.114 * img[y, x, 2])
+            gray[y, x] = np.uint8(g)
+    return gray
+
+@njit(cache=True, boundscheck=False)
+def _gray_hist_jit(gray_u8):
+    """Histogram 256 bin (float64) ของภาพ Gray uint8"""
+    # [Optimize] แยกนับลง 4 Histogram ย่อย สลับกันทีละพิกเซล
+    # พิกเซลติดกันที่ค่าเท่ากัน (พื้นที่เรียบ) จะไม่ต้องรอ load-add-store ของ bin เดียวกัน
+    flat = gray_u8.ravel()
+    n = flat.size
+    sub = np.zeros((4, 256), dtype=np.int64)
     
-    # 1. Loop เดียวจบ เร็วกว่า np.histogram มาก
-    for i in range(size):
-        ho[int(fo[i])] += 1
-        hs[int(fs[i])] += 1
+    i = 0
+    while i + 4 <= n:
+        sub[0, flat[i]] += 1
+        sub[1, flat[i + 1]] += 1
+        sub[2, flat[i + 2]] += 1
+        sub[3, flat[i + 3]] += 1
+        i += 4
+    while i < n:
+        sub[0, flat[i]] += 1
+        i += 1
         
+    hist = np.empty(256, dtype=np.float64)
+    for b in range(256):
+        hist[b] = sub[0, b] + sub[1, b] + sub[2, b] + sub[3, b]
+    return hist
+
+@njit(cache=True, boundscheck=False)
+def _delta_hist_jit(orig, stego, positions, ho):
+    """
+    Histogram ของภาพ Stego จาก Histogram ต้นฉบับ (ho) + ผลต่างเฉพาะพิกเซลที่ถูกแก้
+    (พิกเซลอื่นค่า Gray เท่าเดิม) -> ได้จำนวนนับเท่ากับการนับใหม่ทั้งภาพทุก bin
+    """
+    fo = orig.reshape(-1, orig.shape[-1])
+    fs = stego.reshape(-1, stego.shape[-1])
+    hs = ho.copy()
+    for i in range(positions.size):
+        p = positions[i]
+        go = np.uint8(np.float32(0.299 * fo[p, 0] + 0.587 * fo[p, 1] + 0.114 * fo[p, 2]))
+        gs = np.uint8(np.float32(0.299 * fs[p, 0] + 0.587 * fs[p, 1] + 0.114 * fs[p, 2]))
+        if go != gs:
+            hs[go] -= 1.0
+            hs[gs] += 1.0
+    return hs
+
+@njit(cache=True)
+def _hist_stats_jit(ho, hs, size, density=False):
+    """คำนวณ Drift & Chi-Square จาก Histogram ที่นับไว้แล้ว"""
     if density:
-        ho /= size
-        hs /= size
+        ho = ho / size
+        hs = hs / size
         
     drift = 0.0
     for i in range(256):
@@ -52,20 +131,52 @@ def _calc_hist_stats_jit(o_gray, s_gray, density=False):
     return drift, chi_sq
 
 @njit(cache=True)
+def _calc_hist_stats_jit(o_gray, s_gray, density=False):
+    """คำนวณ Histogram Stats (Drift & Chi-Square)"""
+    # นับ bin ด้วย Kernel Sub-histogram (_gray_hist_jit) ไม่มีการคำนวณขอบ bin แบบ np.histogram
+    ho = _gray_hist_jit(o_gray)
+    hs = _gray_hist_jit(s_gray)
+    return _hist_stats_jit(ho, hs, o_gray.size, density)
+
+@njit(cache=True, boundscheck=False)
 def _psnr_jit(orig, stego):
     """คำนวณ PSNR แบบ Pixel-wise (ไม่กิน RAM)"""
-    h, w, c = orig.shape
-    sum_sq = 0.0
-    count = h * w * c
+    # [Optimize] วน Loop เดียวบน View 1D (Stride ต่อเนื่อง -> LLVM ทำ SIMD ได้)
+    # ผลต่างของ uint8 เป็นจำนวนเต็ม: int32 พอสำหรับ diff^2 และสะสมเป็น int64 (แม่นตรง)
+    fo = orig.ravel()
+    fs = stego.ravel()
+    count = fo.size
+    sum_sq = 0
     
-    # Loop คำนวณผลรวมความต่างยกกำลังสองโดยตรง
-    for y in range(h):
-        for x in range(w):
-            for k in range(c):
-                diff = float(orig[y, x, k]) - float(stego[y, x, k])
-                sum_sq += diff * diff
+    for i in range(count):
+        diff = np.int32(fo[i]) - np.int32(fs[i])
+        sum_sq += diff * diff
                 
-    mse = sum_sq / count
+    mse = np.float64(sum_sq) / count
+    if mse <= 1e-12:
+        return 999.0 # Infinity
+    
+    return 20.0 * np.log10(255.0) - 10.0 * np.log10(mse)
+
+@njit(cache=True, boundscheck=False)
+def _psnr_sparse_jit(orig, stego, positions):
+    """
+    PSNR โดยรวมผลต่างเฉพาะพิกเซลที่ถูกแก้ (positions = Flat Index ของพิกเซล)
+    พิกเซลอื่นมีผลต่างเป็น 0 อยู่แล้ว -> ได้ค่าเท่ากับ _psnr_jit ทุกบิต
+    """
+    fo = orig.reshape(-1, orig.shape[-1])
+    fs = stego.reshape(-1, stego.shape[-1])
+    channels = fo.shape[1]
+    count = fo.size
+    sum_sq = 0
+    
+    for i in range(positions.size):
+        p = positions[i]
+        for k in range(channels):
+            diff = np.int32(fo[p, k]) - np.int32(fs[p, k])
+            sum_sq += diff * diff
+            
+    mse = np.float64(sum_sq) / count
     if mse <= 1e-12:
         return 999.0 # Infinity
     
@@ -101,49 +212,152 @@ def _ssim_combine_jit(mu_x, mu_y, sigma_x2, sigma_y2, sigma_xy, C1, C2):
             
     return ssim_sum / (h * w)
 
+@njit(cache=True)
+def _reflect_index(i, n):
+    """Index แบบสะท้อนขอบ (เหมือน mode='reflect' ของ ndimage: d c b a | a b c d)"""
+    period = 2 * n
+    i = i % period
+    if i >= n:
+        i = period - 1 - i
+    return i
+
+@njit(cache=True, parallel=True, boundscheck=False)
+def _gauss_sep_conv_jit(stack, kernel):
+    """
+    Separable Convolution (แกน H แล้วแกน W) ของภาพหลายชั้น (n, H, W) ในครั้งเดียว
+    แบบ Parallel ทีละแถวของทุกชั้น (prange) -> จองหน่วยความจำแค่ 2 ก้อน
+    เลียนแบบ ndimage.convolve1d (mode='reflect') ทุกบิต:
+    สะสมใน float64, Kernel สมมาตร -> center ก่อน แล้วคู่ (ซ้าย+ขวา) จากนอกเข้าใน
+    และปัดผลกลางเป็น float32 ระหว่าง 2 Pass
+    """
+    n, h, w = stack.shape
+    r = kernel.size // 2
+    wts = kernel.astype(np.float64)
+    tmp = np.empty((n, h, w), dtype=np.float32)
+    out = np.empty((n, h, w), dtype=np.float32)
+
+    rows = np.empty(h + 2 * r, dtype=np.int64)
+    for i in range(h + 2 * r):
+        rows[i] = _reflect_index(i - r, h)
+
+    # Pass 1: แนวตั้ง (แกน H) -> วนตาม x ด้านในให้อ่าน Memory ต่อเนื่อง
+    for task in prange(n * h):
+        p = task // h
+        y = task % h
+        img = stack[p]
+        acc = np.empty(w, dtype=np.float64)
+        c = rows[y + r]
+        for x in range(w):
+            acc[x] = np.float64(img[c, x]) * wts[r]
+        for j in range(r, 0, -1):
+            up = rows[y + r - j]
+            dn = rows[y + r + j]
+            wj = wts[r - j]
+            for x in range(w):
+                acc[x] += (np.float64(img[up, x]) + np.float64(img[dn, x])) * wj
+        for x in range(w):
+            tmp[p, y, x] = acc[x]
+
+    # Pass 2: แนวนอน (แกน W) -> คัดลอกแถว + ขอบสะท้อนลง Buffer ของ Thread
+    for task in prange(n * h):
+        p = task // h
+        y = task % h
+        line = np.empty(w + 2 * r, dtype=np.float64)
+        for i in range(w + 2 * r):
+            line[i] = tmp[p, y, _reflect_index(i - r, w)]
+        acc = np.empty(w, dtype=np.float64)
+        for x in range(w):
+            acc[x] = line[x + r] * wts[r]
+        for j in range(r, 0, -1):
+            wj = wts[r - j]
+            for x in range(w):
+                acc[x] += (line[x + r - j] + line[x + r + j]) * wj
+        for x in range(w):
+            out[p, y, x] = acc[x]
+
+    return out
+
 # =============================================================================
 # 3. PUBLIC FUNCTIONS (เรียกใช้งานจากภายนอก)
 # =============================================================================
 
-def compute_psnr(orig: np.ndarray, stego: np.ndarray) -> float:
+def compute_psnr(orig: np.ndarray, stego: np.ndarray, positions: np.ndarray = None) -> float:
+    # positions: Flat Index ของพิกเซลที่ถูกแก้ (ถ้ารู้) -> คิดเฉพาะจุดนั้น O(จำนวนพิกเซลที่ฝัง)
+    if positions is not None and orig.ndim == 3:
+        return float(_psnr_sparse_jit(orig, stego, positions))
     # เรียก JIT kernel
     return float(_psnr_jit(orig, stego))
 
 def compute_ssim(orig: np.ndarray, stego: np.ndarray) -> float:
-    # 1. เตรียมภาพ Grayscale
-    x = _to_gray_jit(orig)
-    y = _to_gray_jit(stego)
+    # 1. เตรียมภาพ Grayscale (ภาพเต็ม -> ใช้ตัว Parallel)
+    x = _to_gray_par_jit(orig)
+    y = _to_gray_par_jit(stego)
     
-    C1 = 6.5025
-    C2 = 58.5225
-    
-    # 2. เตรียม 1D Gaussian Kernel (สำหรับ Separable Convolution)
+    # 2. 1D Gaussian Kernel (สร้างไว้ระดับ Module แล้ว)
     # [Optimization] การทำ 1D Conv สองครั้ง เร็วกว่า 2D Conv หนึ่งครั้งมากๆ
-    win_size = 11
-    sigma = 1.5
-    ax = np.arange(-win_size // 2 + 1., win_size // 2 + 1.)
-    gauss = np.exp(-0.5 * np.square(ax) / np.square(sigma))
-    gauss /= np.sum(gauss)
-    kernel = gauss.astype(np.float32)
-
-    # ฟังก์ชันช่วยทำ 1D convolution สองแกน
-    def fast_conv(img):
-        tmp = ndimage.convolve1d(img, kernel, axis=0, mode='reflect')
-        return ndimage.convolve1d(tmp, kernel, axis=1, mode='reflect')
+    kernel = _SSIM_KERNEL
 
     # 3. คำนวณค่าทางสถิติ (Convolution)
-    mu_x = fast_conv(x)
-    mu_y = fast_conv(y)
-    sigma_x2 = fast_conv(x * x)
-    sigma_y2 = fast_conv(y * y)
-    sigma_xy = fast_conv(x * y)
+    # [Optimize] วาง x, y, x*x, y*y, x*y ซ้อนเป็น (5, H, W) แล้ว Convolve ครั้งเดียว
+    # (Kernel อยู่ใน Cache ตลอด และจองหน่วยความจำแค่ก้อนเดียวแทน 5 ก้อน)
+    h, w = x.shape
+    stack = np.empty((5, h, w), dtype=np.float32)
+    stack[0] = x
+    stack[1] = y
+    np.multiply(x, x, out=stack[2])
+    np.multiply(y, y, out=stack[3])
+    np.multiply(x, y, out=stack[4])
+    
+    mu_x, mu_y, sigma_x2, sigma_y2, sigma_xy = _gauss_sep_conv_jit(stack, kernel)
     
     # 4. รวมผลลัพธ์ด้วย JIT
-    return float(_ssim_combine_jit(mu_x, mu_y, sigma_x2, sigma_y2, sigma_xy, C1, C2))
+    return float(_ssim_combine_jit(mu_x, mu_y, sigma_x2, sigma_y2, sigma_xy, _SSIM_C1, _SSIM_C2))
+
+def _box_mean(img: np.ndarray, win_size: int) -> np.ndarray:
+    """ค่าเฉลี่ยในหน้าต่าง win x win ด้วย Summed-Area Table (O(1) ต่อพิกเซล ไม่ขึ้นกับขนาดหน้าต่าง)"""
+    pad = win_size // 2
+    # 'symmetric' ของ np.pad = 'reflect' ของ ndimage (d c b a | a b c d)
+    padded = np.pad(img.astype(np.float64), pad, mode='symmetric')
+    
+    sat = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.float64)
+    np.cumsum(padded, axis=0, out=sat[1:, 1:])
+    np.cumsum(sat[1:, 1:], axis=1, out=sat[1:, 1:])
+    
+    h, w = img.shape
+    window_sum = (sat[win_size:win_size + h, win_size:win_size + w]
+                  - sat[:h, win_size:win_size + w]
+                  - sat[win_size:win_size + h, :w]
+                  + sat[:h, :w])
+    return window_sum / (win_size * win_size)
+
+def compute_ssim_fast(orig: np.ndarray, stego: np.ndarray, win_size: int = 11) -> float:
+    """
+    SSIM แบบเร็ว (ค่าประมาณ): ใช้หน้าต่างสี่เหลี่ยม (Box/UQI-style) แทน Gaussian
+    เวลาไม่ขึ้นกับขนาดหน้าต่าง ค่าที่ได้ใกล้เคียงแต่ไม่เท่ากับ compute_ssim
+    """
+    if win_size % 2 == 0 or win_size < 3:
+        raise ValueError("win_size must be odd and >= 3")
+
+    x = _to_gray_par_jit(orig)
+    y = _to_gray_par_jit(stego)
+    
+    mu_x = _box_mean(x, win_size)
+    mu_y = _box_mean(y, win_size)
+    sigma_x2 = _box_mean(x * x, win_size)
+    sigma_y2 = _box_mean(y * y, win_size)
+    sigma_xy = _box_mean(x * y, win_size)
+    
+    return float(_ssim_combine_jit(mu_x, mu_y, sigma_x2, sigma_y2, sigma_xy, _SSIM_C1, _SSIM_C2))
 
-def histogram_drift(orig: np.ndarray, stego: np.ndarray) -> float:
-    o_gray = _to_gray_jit(orig).astype(np.uint8)
-    s_gray = _to_gray_jit(stego).astype(np.uint8)
+def histogram_drift(orig: np.ndarray, stego: np.ndarray, positions: np.ndarray = None) -> float:
+    o_gray = _to_gray_u8_jit(orig)
+    if positions is not None and orig.ndim == 3:
+        # positions: Flat Index ของพิกเซลที่ถูกแก้ -> ไม่ต้องแปลง/นับภาพ Stego ใหม่ทั้งภาพ
+        ho = _gray_hist_jit(o_gray)
+        hs = _delta_hist_jit(orig, stego, positions, ho)
+        drift, _ = _hist_stats_jit(ho, hs, o_gray.size, density=True)
+        return float(drift)
+    s_gray = _to_gray_u8_jit(stego)
     drift, _ = _calc_hist_stats_jit(o_gray, s_gray, density=True)
     return float(drift)
 
@@ -160,7 +374,7 @@ def variance_ratio_block(orig_block: np.ndarray, stego_block: np.ndarray) -> flo
     return float(abs(vs - vo) / (vo + 1e-6))
 
 def chi_square_block(orig_block: np.ndarray, stego_block: np.ndarray) -> float:
-    o_gray = _to_gray_jit(orig_block).astype(np.uint8)
-    s_gray = _to_gray_jit(stego_block).astype(np.uint8)
+    o_gray = _to_gray_u8_jit(orig_block)
+    s_gray = _to_gray_u8_jit(stego_block)
     _, chi_sq = _calc_hist_stats_jit(o_gray, s_gray, density=False)
     return float(chi_sq)
\ No newline at end of file
@@ -59,11 +59,19 @@ class LSBPP:
         encrypt_mode: str,
         password: Optional[str] = None,
         public_key_path: Optional[str] = None,
-        status_callback: Optional[Callable[[str, int], None]] = None
+        status_callback: Optional[Callable[[str, int], None]] = None,
+        metric_quality: str = "full"
     ):
+        """
+        metric_quality: "full" = วัด PSNR/SSIM/Drift บนภาพเต็ม (ค่าเริ่มต้น)
+                        "fast" = วัดบนภาพย่อ 2x (Subsample) เร็วขึ้น ~4 เท่า ค่าเป็นค่าประมาณ
+        """
         def update(text, percent):
             if status_callback: status_callback(text, percent)
         
+        if metric_quality not in ("full", "fast"):
+            raise ValueError("metric_quality must be 'full' or 'fast'")
+        
         # 1) Load & Prep
         update("Loading cover image...", 5)
         cover = self.load_png(cover_path)    
@@ -106,49 +114,44 @@ class LSBPP:
         update("Converting to bitstream...", 50)
         bits = bitutil.bytes_to_bits(stream)
         
-        # 6) Block Optimization (Vectorized Broadcasting)
-        update("Preparing block optimization maps...", 60)
+        # 6) Block Count (ใช้จองบัฟเฟอร์ block_done)
         h, w = cover.shape[:2]
-        num_pixels = h * w
-        block_cols = (w + 7) // 8
-        
-        # [Optimize] Broadcasting คำนวณ Block Map ทีเดียวทั้งภาพ
-        row_indices = np.arange(h, dtype=np.int32) // 8
-        col_indices = np.arange(w, dtype=np.int32) // 8
-        block_map = (row_indices[:, None] * block_cols + col_indices[None, :]).ravel()
-
-        # [Optimize] Grouping
-        pixel_block_ids = block_map[order]
-        sort_idx = np.argsort(pixel_block_ids)
-        sorted_blocks = pixel_block_ids[sort_idx]
-        diff_idx = np.where(np.diff(sorted_blocks) != 0)[0] + 1
-        split_positions = np.split(sort_idx, diff_idx)
-        unique_block_ids = sorted_blocks[np.insert(diff_idx, 0, 0)]
-        block_pixel_positions = dict(zip(unique_block_ids, split_positions))
+        num_blocks = ((h + 7) // 8) * ((w + 7) // 8)
         
         # 7) Embedding (JIT Loop)
         update("Embedding data into pixels...", 70)
         thresholds = BlockSafetyThresholds()
         
-        stego = embed_bits_low_level(
+        stego, embedded_positions = embed_bits_low_level(
             cover.copy(),
             order,
             capacity_map.ravel(),
             bits,
-            block_map,
-            np.zeros(len(unique_block_ids) + 100, dtype=bool), # block_done buffer
-            block_pixel_positions,
+            None, # block_map (ไม่ใช้แล้ว)
+            np.zeros(num_blocks + 100, dtype=bool), # block_done buffer
+            None, # block_pixel_positions (ไม่ใช้แล้ว)
             gray,
             adjust_capacity_for_pixel,
             lambda o, s: is_block_safe(o, s, thresholds),
+            return_positions=True,
         )
          
         # 8) Metrics
         update("Calculating quality metrics...", 95)
+        if metric_quality == "fast":
+            # [Optimize] วัดบนภาพย่อ (ทุก 2 พิกเซล) -> ข้อมูลน้อยลง 4 เท่า (ค่าประมาณสำหรับแสดงผล)
+            metric_cover = np.ascontiguousarray(cover[::2, ::2])
+            metric_stego = np.ascontiguousarray(stego[::2, ::2])
+            changed_positions = None
+        else:
+            metric_cover, metric_stego = cover, stego
+            # PSNR / Drift คิดเฉพาะพิกเซลที่ถูกฝัง (ที่เหลือเหมือนต้นฉบับ ผลต่างเป็น 0)
+            changed_positions = embedded_positions
+            
         metrics = EmbedMetrics(
-            psnr=compute_psnr(cover, stego),
-            ssim=compute_ssim(cover, stego),
-            hist_drift=histogram_drift(cover, stego)
+            psnr=compute_psnr(metric_cover, metric_stego, changed_positions),
+            ssim=compute_ssim(metric_cover, metric_stego),
+            hist_drift=histogram_drift(metric_cover, metric_stego, changed_positions)
         )
         update("Done.", 100)
         return stego, metrics
@@ -306,6 +309,10 @@ class LSBPP:
         if not os.path.isfile(path): raise Exception(f"File not found: {path}")
         with Image.open(path) as img:
             self._validate_png_image(img, path)
+            if img.mode == "RGB":
+                # [Optimize] เป็น RGB อยู่แล้ว -> Decode ครั้งเดียวแล้วอ่านตรง ไม่ต้อง convert (ลดการ Copy ทั้งภาพ 1 รอบ)
+                img.load()
+                return np.asarray(img, dtype=np.uint8)
             return np.asarray(img.convert("RGB"), dtype=np.uint8)
     
     def _validate_png_image(self, img: Image.Image, path: str) -> None:
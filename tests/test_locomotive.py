@@ -0,0 +1,153 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from app.core.crypto.sym_crypto import aes_gcm_decrypt, derive_key_argon2id
+from app.core.stego.locomotive.locomotive import Locomotive, _scan_fragments
+
+
+def _frag(idx, chunk):
+    # [SIG(4)][Index(4)][Len(4)] + [Data]
+    return struct.pack(">4sII", b"FRAG", idx, len(chunk)) + chunk
+
+
+def _write_png(path, seed=0):
+    rng = np.random.default_rng(seed)
+    Image.fromarray(rng.integers(0, 256, (32, 48, 3), dtype=np.uint8)).save(path)
+
+
+class FragmentTest(unittest.TestCase):
+    """Fragment -> Defragment ต้องได้ข้อมูลเดิมทุกขนาด (รวมขอบ Block 4096)"""
+
+    SIZES = (1, 4095, 4096, 4097, 50_000)
+
+    def test_round_trip(self):
+        for size in self.SIZES:
+            data = os.urandom(size)
+            stream = Locomotive.fragment_payload(data)
+            self.assertEqual(len(stream), size + 12 * -(-size // 4096))
+            self.assertEqual(Locomotive.defragment_payload(stream), data)
+
+    def test_empty_payload(self):
+        self.assertEqual(Locomotive.fragment_payload(b""), b"")
+        self.assertIsNone(Locomotive.defragment_payload(b""))
+
+    def test_out_of_order(self):
+        stream = _frag(2, b"cc") + _frag(0, b"a") + _frag(1, b"bbb")
+        self.assertEqual(Locomotive.defragment_payload(stream), b"abbbcc")
+
+    def test_stops_at_truncated_fragment(self):
+        stream = _frag(1, b"bb") + _frag(0, b"aaaa")[:-1]
+        self.assertEqual(Locomotive.defragment_payload(stream), b"bb")
+
+    def test_stops_at_bad_signature(self):
+        stream = _frag(1, b"bb") + _frag(0, b"a") + b"JUNK" + bytes(20)
+        self.assertEqual(Locomotive.defragment_payload(stream), b"abb")
+
+    def test_many_small_fragments(self):
+        # Fragment เล็กจำนวนมาก เรียงกลับด้าน (Header ถี่กว่าข้อมูล)
+        chunks = [bytes([i % 251]) * (i % 5) for i in range(3000)]
+        stream = b"".join(_frag(i, chunks[i]) for i in reversed(range(3000)))
+        self.assertEqual(Locomotive.defragment_payload(stream), b"".join(chunks))
+
+    def test_scan_returns_only_parsed_fragments(self):
+        # Array ผลลัพธ์ต้องยาวเท่าจำนวน Fragment ที่อ่านได้จริง (ไม่จองตามขนาด Stream)
+        stream = _frag(1, b"bb") + _frag(0, b"a") + bytes(5000)
+        offs, lens, idxs = _scan_fragments(
+            np.frombuffer(stream, dtype=np.uint8), np.frombuffer(b"FRAG", dtype=np.uint8)
+        )
+        self.assertEqual(offs.tolist(), [12, 26])
+        self.assertEqual(lens.tolist(), [2, 1])
+        self.assertEqual(idxs.tolist(), [1, 0])
+
+    def test_iter_headers(self):
+        data = os.urandom(10_000)
+        seen = []
+        for header, chunk in Locomotive.fragment_payload_iter(data):
+            sig, idx, length = struct.unpack(">4sII", header)
+            self.assertEqual(sig, Locomotive.FRAG_SIG)
+            self.assertEqual(bytes(chunk), data[idx * 4096:idx * 4096 + length])
+            seen.append(idx)
+        self.assertEqual(sorted(seen), [0, 1, 2])
+
+
+class HideExtractTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+        self.cover = os.path.join(self.tmp, "cover.png")
+        _write_png(self.cover)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _out(self, name):
+        return os.path.join(self.tmp, name)
+
+    def test_hide_bytes(self):
+        secret = os.urandom(5000)
+        ok, msg = Locomotive.hide_bytes_core(self.cover, (b"head", secret), self._out("b.png"))
+        self.assertTrue(ok, msg)
+        raw, msg = Locomotive.get_raw_payload_core(self._out("b.png"))
+        self.assertEqual(raw, b"head" + secret, msg)
+
+    def test_hide_stream(self):
+        secret = os.urandom(20_000)
+        ok, msg = Locomotive.hide_stream_core(
+            self.cover, Locomotive.fragment_payload_iter(secret), self._out("s.png")
+        )
+        self.assertTrue(ok, msg)
+        with open(self.cover, "rb") as f_cover, open(self._out("s.png"), "rb") as f_out:
+            self.assertTrue(f_out.read().startswith(f_cover.read()))
+        raw, msg = Locomotive.get_raw_payload_core(self._out("s.png"))
+        self.assertEqual(Locomotive.defragment_payload(raw), secret, msg)
+
+    def test_embed_single_none(self):
+        payload = self._out("secret.bin")
+        secret = os.urandom(9000)
+        with open(payload, "wb") as f: f.write(secret)
+
+        result = Locomotive().embed([self.cover], payload, "none")
+        raw, msg = Locomotive.get_raw_payload_core(result)
+        self.assertEqual(Locomotive.defragment_payload(raw), b"\x00" + secret, msg)
+
+    def test_embed_single_password(self):
+        payload = self._out("secret.bin")
+        secret = os.urandom(9000)
+        with open(payload, "wb") as f: f.write(secret)
+
+        result = Locomotive().embed([self.cover], payload, "password", password="pw")
+        raw, msg = Locomotive.get_raw_payload_core(result)
+        data = Locomotive.defragment_payload(raw)
+        # [0x01] [SALT(16)] [NONCE(12)] [CIPHERTEXT]
+        self.assertEqual(data[0], 1)
+        key = derive_key_argon2id("pw", data[1:17])
+        self.assertEqual(aes_gcm_decrypt(key, data[17:29], data[29:]), secret)
+
+    def test_embed_shards(self):
+        covers = []
+        for i in range(3):
+            path = self._out(f"c{i}.png")
+            _write_png(path, seed=i)
+            covers.append(path)
+        payload = self._out("secret.bin")
+        secret = os.urandom(10_001)
+        with open(payload, "wb") as f: f.write(secret)
+
+        out_dir = Locomotive().embed(covers, payload, "none")
+        parts = {}
+        for i in range(3):
+            raw, msg = Locomotive.get_raw_payload_core(os.path.join(out_dir, f"c{i}_part_{i + 1}.png"))
+            _, idx, total = struct.unpack(">III", raw[:12])
+            self.assertEqual(total, 3)
+            parts[idx] = raw[12:]
+        self.assertEqual(b"".join(parts[i] for i in sorted(parts)), b"\x00" + secret)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from app.core.stego.locomotive.V4.locomotive import StegoLogic
+
+
+def _frag(idx, chunk):
+    # [SIG(4)][Index(4)][Len(4)] + [Data]
+    return struct.pack(">4sII", b"FRAG", idx, len(chunk)) + chunk
+
+
+class FragmentTest(unittest.TestCase):
+    """V4: Fragment -> Defragment ต้องได้ข้อมูลเดิมทุกขนาด (รวมขอบ Block 4096)"""
+
+    def test_round_trip(self):
+        for size in (1, 4095, 4096, 4097, 50_000):
+            data = os.urandom(size)
+            stream = StegoLogic.fragment_payload(data)
+            self.assertEqual(len(stream), size + 12 * -(-size // 4096))
+            self.assertEqual(StegoLogic.defragment_payload(stream), data)
+
+    def test_out_of_order(self):
+        stream = _frag(2, b"cc") + _frag(0, b"a") + _frag(1, b"bbb")
+        self.assertEqual(StegoLogic.defragment_payload(stream), b"abbbcc")
+
+    def test_stops_at_truncated_fragment(self):
+        stream = _frag(1, b"bb") + _frag(0, b"aaaa")[:-1]
+        self.assertEqual(StegoLogic.defragment_payload(stream), b"bb")
+
+    def test_stops_at_bad_signature(self):
+        stream = _frag(1, b"bb") + _frag(0, b"a") + b"JUNK" + bytes(20)
+        self.assertEqual(StegoLogic.defragment_payload(stream), b"abb")
+
+    def test_no_fragments(self):
+        self.assertIsNone(StegoLogic.defragment_payload(b"not a fragment stream"))
+
+
+class JobTest(unittest.TestCase):
+    """V4: งานฝัง/ถอดที่รันใน Worker Thread (เรียกตรงโดยไม่ผ่าน GUI)"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+        self.out_dir = os.path.join(self.tmp, "out")
+        os.makedirs(self.out_dir)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _cover(self, rel_path, seed):
+        path = os.path.join(self.tmp, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        rng = np.random.default_rng(seed)
+        Image.fromarray(rng.integers(0, 256, (24, 32, 3), dtype=np.uint8)).save(path, format="PNG")
+        return path
+
+    def _payload(self, size):
+        path = os.path.join(self.tmp, "secret.bin")
+        data = os.urandom(size)
+        with open(path, "wb") as f: f.write(data)
+        return path, data
+
+    def _split_join(self, covers, size):
+        payload_path, secret = self._payload(size)
+        level, _, msg = StegoLogic._embed_shards_job(
+            covers, payload_path, self.out_dir, 1234, lambda done, total: None
+        )
+        self.assertEqual(level, "information", msg)
+
+        outputs = [os.path.join(self.out_dir, name) for name in sorted(os.listdir(self.out_dir))]
+        self.assertEqual(len(outputs), len(covers))
+
+        result = StegoLogic._collect_shards_job(outputs[::-1], lambda done, total: None)
+        self.assertIsInstance(result, dict, result)
+        self.assertEqual(result["total"], len(covers))
+
+        joined = os.path.join(self.tmp, "joined.bin")
+        level, _, msg = StegoLogic._write_joined_job(result["datas"], joined)
+        self.assertEqual(level, "information", msg)
+        with open(joined, "rb") as f:
+            self.assertEqual(f.read(), secret)
+
+    def test_single_embed_extract(self):
+        payload_path, secret = self._payload(20_000)
+        stego = os.path.join(self.tmp, "stego.png")
+        level, _, msg = StegoLogic._embed_single_job(self._cover("c.png", 0), payload_path, stego)
+        self.assertEqual(level, "information", msg)
+
+        out = os.path.join(self.tmp, "out.bin")
+        level, _, msg = StegoLogic._extract_single_job(stego, out)
+        self.assertEqual(level, "information", msg)
+        with open(out, "rb") as f:
+            self.assertEqual(f.read(), secret)
+
+    def test_split_join(self):
+        covers = [self._cover(f"c{i}.png", i) for i in range(4)]
+        self._split_join(covers, 10_001)
+
+    def test_split_join_duplicate_basenames(self):
+        # ชื่อซ้ำกัน (คนละโฟลเดอร์ / คนละนามสกุล) ต้องไม่เขียนทับไฟล์เดียวกัน
+        covers = [
+            self._cover("a/x.png", 0),
+            self._cover("b/x.png", 1),
+            self._cover("c/x.jpg", 2),
+        ]
+        self._split_join(covers, 7000)
+
+    def test_shard_save_paths_unique(self):
+        paths = StegoLogic._shard_save_paths(
+            ["d1/a.png", "d2/a.jpg", "b.png", "a_2.png", "A.png"], "/out"
+        )
+        self.assertEqual(len({p.lower() for p in paths}), len(paths))
+        self.assertEqual(paths[2], os.path.join("/out", "b.png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
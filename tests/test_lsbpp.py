@@ -0,0 +1,93 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from app.core.stego.lsb_plus.engine.analyzer.capacity import compute_capacity
+from app.core.stego.lsb_plus.engine.analyzer.texture_map import compute_texture_features
+from app.core.stego.lsb_plus.engine.pixel_order import build_pixel_order
+from app.core.stego.lsb_plus.lsbpp import LSBPP
+
+
+def _cover_image():
+    """ภาพทดสอบคงที่: Noise + พื้นที่เรียบ + Gradient แนวนอน"""
+    rng = np.random.default_rng(1)
+    img = rng.integers(0, 256, (96, 130, 3), dtype=np.uint8)
+    img[:30, :40] = 120
+    img[40:60, :] = np.linspace(0, 255, 130, dtype=np.uint8)[None, :, None]
+    return img
+
+
+def _sha256(arr):
+    return hashlib.sha256(np.ascontiguousarray(arr).tobytes()).hexdigest()
+
+
+class AnalyzerTest(unittest.TestCase):
+    """
+    Capacity Map และ Pixel Order ต้องตรงกับ Implementation เดิมทุกค่า
+    (Embed/Extract คำนวณแยกกัน ถ้าต่างกันแม้ 1 พิกเซลจะถอดข้อมูลไม่ได้)
+    """
+
+    def test_capacity_and_order_match_reference(self):
+        gray, grad, entropy, surface = compute_texture_features(_cover_image())
+        capacity = compute_capacity(surface)
+        order = build_pixel_order(entropy, "pw")
+
+        self.assertEqual(capacity.dtype, np.uint8)
+        self.assertEqual(
+            _sha256(capacity),
+            "f8578940469044c7c8db209a95c088465420272e72266dc490376d9aea4c27fa",
+        )
+        self.assertEqual(
+            _sha256(order.astype(np.int64)),
+            "f73bf9e4c70483b5c1a2584ad0bfc61dbdf63506ef7ede59d54106bc0e3fde84",
+        )
+
+
+class EmbedExtractTest(unittest.TestCase):
+
+    TEXT = "สวัสดี hello " * 20
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cover = os.path.join(self._tmp.name, "cover.png")
+        Image.fromarray(_cover_image()).save(self.cover)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _round_trip(self, mode, password=None, metric_quality="full"):
+        engine = LSBPP()
+        stego, metrics = engine.embed(
+            self.cover, self.TEXT, encrypt_mode=mode, password=password, metric_quality=metric_quality
+        )
+        stego_path = os.path.join(self._tmp.name, f"stego_{mode}.png")
+        Image.fromarray(stego).save(stego_path)
+
+        # ภาพ Cover ต้องไม่ถูกแก้ และ Metrics ต้องอยู่ในช่วงที่สมเหตุสมผล
+        self.assertTrue(np.array_equal(np.asarray(Image.open(self.cover).convert("RGB")), _cover_image()))
+        self.assertGreater(metrics.psnr, 40.0)
+        self.assertLessEqual(metrics.ssim, 1.0)
+
+        return engine.extract(stego_path, encrypt_mode=mode, password=password)
+
+    def test_none(self):
+        self.assertEqual(self._round_trip("none"), self.TEXT)
+
+    def test_password(self):
+        self.assertEqual(self._round_trip("password", "pw"), self.TEXT)
+
+    def test_fast_metrics(self):
+        # โหมด fast วัดบนภาพย่อ แต่ภาพ Stego ต้องถอดได้เหมือนเดิม
+        self.assertEqual(self._round_trip("none", metric_quality="fast"), self.TEXT)
+
+    def test_invalid_metric_quality(self):
+        with self.assertRaises(ValueError):
+            LSBPP().embed(self.cover, self.TEXT, encrypt_mode="none", metric_quality="medium")
+
+
+if __name__ == "__main__":
+    unittest.main()